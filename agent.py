@@ -1,3 +1,4 @@
+import uuid
 import threading
 from typing import List, Union
 
@@ -42,7 +43,8 @@ class ExecutionAgent():
             execution_tool = SearchExecutionTool()
             return execution_tool
         elif self.executor_name == "Pipeline Executor":
-            execution_tool = WebExecutionTool()
+            # *所有使用者共用同一個 BrowserPool，每個 session 需要唯一的 user_id
+            execution_tool = WebExecutionTool(user_id=uuid.uuid4().hex)
 
             # *啟動瀏覽器初始化執行緒
             self.create_browser_thread = threading.Thread(
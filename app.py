@@ -1,13 +1,14 @@
 import os
 import shutil
+import threading
 import gradio as gr
 
 from typing import List
 from dotenv import load_dotenv
 from langgraph.errors import GraphRecursionError
-from base64 import b64encode
 
 from graph import ExecutionGraph
+from tool import get_website_retriever_engine, get_browser_pool
 
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
@@ -85,11 +86,10 @@ async def stream_chat(user_message, messages: List[gr.ChatMessage], execution_gr
 
                     # *顯示 Pipeline 模組操作結果截圖
                     if agent == "Pipeline Executor":
-                        current_screenshot_name = execution_graph.get_current_screenshot_name()
-                        current_screenshot_path = os.path.join(SCREENSHOT_FOLDER_PATH, current_screenshot_name + ".png")
-                        with open(current_screenshot_path, "rb") as f:
-                            data = b64encode(f.read()).decode("utf-8")
-                            response += f"![{current_screenshot_name}](data:image/png;base64,{data})\n"
+                        # *截圖直接由記憶體中的壓縮結果顯示，不需從硬碟讀回
+                        screenshot = await execution_graph.get_current_screenshot()
+                        if screenshot is not None:
+                            response += f"![{screenshot.name}]({screenshot.to_data_uri()})\n"
 
                     messages.append(gr.ChatMessage(role="assistant", content=response + "_" * 10))
 
@@ -118,8 +118,15 @@ with gr.Blocks(css=".fullscreen-chatbot { height: calc(100vh - 200px) !important
         outputs=[user_query, chatbot, execution_graph],
     )
 
-demo.launch()
-# demo.launch(share=True)
+# * PDF 抽取使用 process pool，子行程會重新 import 主程式，因此只在主程式啟動服務
+if __name__ == "__main__":
+    # *啟動時於背景預先載入檢索索引，所有使用者共用同一個索引
+    threading.Thread(target=lambda: get_website_retriever_engine().warm_up(), daemon=True).start()
+    # *啟動時於背景預先啟動瀏覽器容器，Pipeline 模組可以直接借用
+    get_browser_pool().start()
+
+    demo.launch()
+    # demo.launch(share=True)
 
 # Who is the headmaster of National Central University in Taiwan?
 
@@ -1,3 +1,4 @@
+import asyncio
 import operator
 from typing import Annotated, Any, List, Tuple
 
@@ -112,10 +113,22 @@ class ExecutionGraph():
     def get_current_screenshot_name(self):
         return self.agent.tool.current_screenshot_name
 
+    async def get_current_screenshot(self):
+        """
+        Waits for the latest screenshot to be encoded and returns it, or None when there is none.
+        """
+        future = self.agent.tool.current_screenshot
+        if future is None:
+            return None
+        try:
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            print(f"Failed to encode screenshot {self.get_current_screenshot_name()}: {e}")
+            return None
+
 
 
 if __name__ == "__main__":
-    import asyncio
     import os
     import shutil
     import time
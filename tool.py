@@ -1,20 +1,31 @@
 import re
+import json
 import time
+import copy
 import asyncio
-from functools import wraps
-from io import BytesIO
+from functools import wraps, lru_cache
 
 import yaml
-import requests
 import aiohttp
-import pdfplumber
 from bs4 import BeautifulSoup
 
 from langchain_core.tools import tool
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
 
 from utils.selenium_controller import SeleniumController
+from utils.browser_pool import BrowserPool
+from utils.page_waiter import PageWaiter
+from utils.screenshot_pipeline import ScreenshotPipeline
+from utils.retriever_engine import WebsiteRetrieverEngine
+from utils.url_canonicalizer import UrlCanonicalizer
+from utils.link_prober import LinkProber
+from utils.link_status_cache import LinkStatusCache
+from utils.link_graph import LinkGraph
+from utils.snapshot_store import SnapshotStore
+from utils.http_client import SharedHttpClient
+from utils.http_cache import HttpCache, ResponseTooLargeError
+from utils.pdf_extractor import PdfExtractor, count_pages, parse_page_range
+from utils.html_extractor import decode_html, extract_main_text, truncate_text
+from utils.passage_selector import PassageSelector
 
 agent_config_yaml_path = "agent_config.yaml"
 user_privacy_info = {
@@ -24,10 +35,11 @@ user_privacy_info = {
 
 class WebExecutionTool():
     def __init__(self, user_id = "1234"):
-        self.selenium_controller = SeleniumController()
+        self.selenium_controller = SeleniumController(get_browser_pool(), get_page_waiter(), get_screenshot_pipeline())
         self.current_user_id = user_id
         self.current_file_name = None
         self.current_screenshot_name = None
+        self.current_screenshot = None # 壓縮中的截圖 (Future)
         self.current_screenshot_count = 0
         # self.user_privacy_info = {
         #     user_id: {
@@ -49,7 +61,8 @@ class WebExecutionTool():
             def wrapper(*args, **kwargs):
                 # 執行原始函數
                 result = func(*args, **kwargs)
-                time.sleep(0.5)
+                # *等待頁面載入完成、請求結束且 DOM 不再變動後才截圖
+                self.selenium_controller.wait_for_page_settled(self.current_user_id)
                 screen_shot()
 
                 return result
@@ -59,8 +72,8 @@ class WebExecutionTool():
             """Take a screenshot of the current web page."""
             self.current_screenshot_count += 1
             self.current_screenshot_name = f"website_screenshot_{self.current_screenshot_count}"
-            result = self.selenium_controller.screen_shot(self.current_user_id, self.current_screenshot_name)
-            return result
+            self.current_screenshot = self.selenium_controller.screen_shot(self.current_user_id, self.current_screenshot_name)
+            return f"Screenshot {self.current_screenshot_name} taken"
 
         @tool
         @auto_screenshot
@@ -72,6 +85,7 @@ class WebExecutionTool():
         @tool
         def get_html_content() -> str:
             """Get the HTML content of the current web page to gain information to be used in the current step."""
+            self.selenium_controller.wait_for_page_settled(self.current_user_id)
             result = self.selenium_controller.get_content(self.current_user_id)
             print("HTML content of the current web page is retrieved.")
             return result
@@ -192,6 +206,10 @@ class WebExecutionTool():
 # TODO 可以創建一個All Tools class
 class SearchExecutionTool():
     def __init__(self):
+        # *檢索索引由 app.py 啟動時於背景預先載入，這裡不再同步載入以免阻塞 event loop
+        # *Search 工具共用的 HTTP 連線池設定
+        SharedHttpClient.configure(**read_tool_config("Search Executor", "http_client"))
+
         self.tool_list = [
             website_info_retriever,
             website_links_crawler,
@@ -210,21 +228,59 @@ def read_agent_parameter_yaml():
     
     return agents_parameter
 
+@lru_cache(maxsize=None)
+def read_tool_configs():
+    """Read agent_config.yaml once; tool settings are fixed for the lifetime of the process."""
+
+    return read_agent_parameter_yaml()
+
+def read_tool_config(agent_name, tool_name):
+    """Read the tool_config of the given tool under the given agent in agent_config.yaml."""
+
+    tool_config = read_tool_configs().get(agent_name, {}).get("tool_config") or {}
+
+    return copy.deepcopy(tool_config.get(tool_name) or {}) # 回傳複本，呼叫端修改不影響快取
+
+def shared_instance(cls, agent_name, tool_name, config_key=None):
+    """Get the process-wide instance of cls, created from its tool_config on first use."""
+
+    def get_kwargs():
+        tool_config = read_tool_config(agent_name, tool_name)
+        return tool_config.get(config_key) or {} if config_key else tool_config
+
+    return cls.get_or_create(get_kwargs)
+
+def get_browser_pool():
+    """Get the process-wide pool of pre-started browsers shared by all Pipeline sessions."""
+    return shared_instance(BrowserPool, "Pipeline Executor", "browser_pool")
+
+def get_page_waiter():
+    return PageWaiter(**read_tool_config("Pipeline Executor", "page_wait"))
+
+def get_screenshot_pipeline():
+    """Get the process-wide screenshot encoding pipeline shared by all Pipeline sessions."""
+    return shared_instance(ScreenshotPipeline, "Pipeline Executor", "screenshot")
+
+def get_website_retriever_engine():
+    """Get the process-wide retrieval engine shared by all sessions."""
+    return shared_instance(WebsiteRetrieverEngine, "Search Executor", "website_info_retriever")
+
+def get_http_cache():
+    """Get the process-wide HTTP response cache shared by the Search tools."""
+    return shared_instance(HttpCache, "Search Executor", "http_cache")
+
+async def fetch_with_cache(url):
+    return await get_http_cache().fetch(SharedHttpClient.get_session(), url)
+
 @tool
-def website_info_retriever(query: str) -> str:
+async def website_info_retriever(query: str) -> str:
     """Based on user's query perform RAG retrieval on the website information database."""
     print("=" * 10 + " Website Info Retriever " + "=" * 10)
     print(f"Query: {query}")
     print("-" * 3)
 
-    vectorstore = Chroma(
-        embedding_function=OpenAIEmbeddings(),
-        collection_name="ncu_office_websites",
-        persist_directory="utils/Parse Websites v2/ncu_office_websites"
-    )
-
-    website_retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 10})
-    docs = website_retriever.invoke(query)
+    website_retriever_engine = get_website_retriever_engine()
+    docs = await asyncio.to_thread(website_retriever_engine.search, query) # 向量資料庫查詢為同步呼叫，放到執行緒避免阻塞 event loop
 
     result = ""
     for i in range(len(docs)):
@@ -234,134 +290,311 @@ def website_info_retriever(query: str) -> str:
         print("link: ", link)
         print("page_content: \n", page_content)
         result += "link: " + link + "\n" + page_content + "\n"
-    
+
+    print("Retriever stats: ", website_retriever_engine.stats())
     return result
 
-async def process_link(link, url, websites: list):
+def process_link(link, url, canonicalizer: UrlCanonicalizer):
     title = link.get_text(strip=True)
     if title == '':
         print(f"無法獲取連結標題，跳過連結: {link}")
-        return
+        return None
 
     href = link.get('href')
     if not href:
         print(f"無法獲取連結網址，跳過連結: {link}")
-        return
-
-    final_url = ""
-
-    if 'http' in href:
-        final_url = href
-    else:
-        postclitics = ['html', 'htm', 'asp', 'php', 'pdf', 'PDF']
-        url_postclitic = next((p for p in postclitics if p in url), "")
-        psotclitic = any(p in href for p in postclitics)
-
-        temp_url = re.sub(rf'/[^/]+\.{url_postclitic}$', '', url) if psotclitic and url_postclitic else url
-        href = '/' + href.lstrip('/')
-        if temp_url.split('/')[-1] == href.split('/')[1]:
-            temp_url = '/'.join(temp_url.split('/')[:-1])
-        final_url = temp_url + href
+        return None
+
+    final_url = canonicalizer.canonicalize(href, url)
+    if final_url is None:
+        print(f"非網頁連結，跳過連結: {link}")
+        return None
+    if not canonicalizer.add(final_url): # 同一頁面中重複的連結只測試一次
+        return None
+
+    return {'title': title, 'link': final_url}
+
+def extract_links(page_content, base_url):
+    soup = BeautifulSoup(page_content, 'html.parser')
+    links = soup.find_all('a', href=True) # 找出所有超連結 # TODO 讀取iframe有問題
+    print(len(links))
+
+    canonicalizer = UrlCanonicalizer()
+    return [website for website in (process_link(link, base_url, canonicalizer) for link in links) if website is not None]
+
+@lru_cache(maxsize=None)
+def get_link_prober_config():
+    prober_config = read_tool_config("Search Executor", "website_links_crawler")
+    return {
+        "per_host_concurrency": prober_config.get("per_host_concurrency", 8),
+        "request_timeout": prober_config.get("request_timeout", 3),
+        "deadline": prober_config.get("deadline", 10),
+    }
+
+async def crawl_links_async(websites):
+    # *所有連結共用同一個 session 與連線池，並限制每個 host 的同時連線數
+    link_prober = LinkProber(
+        SharedHttpClient.get_session(),
+        cache=shared_instance(LinkStatusCache, "Search Executor", "website_links_crawler", "link_status_cache"),
+        **get_link_prober_config(),
+    )
+    websites = await link_prober.probe_all(websites)
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(final_url, timeout=3, ssl=False) as response:
-                if response.status == 200:
-                    encoding = response.charset or 'utf-8'
-                    websites.append({'title': title, 'link': final_url}) # 連結測試回應成功，加入爬取清單
-                else:
-                    print(f"[{title}]: [{final_url}]測試回應失敗，不加入爬取清單，HTTP 狀態碼: {response.status}")
-    except Exception as e:
-        print(f"[{title}]: [{final_url}]測試回應失敗，不加入爬取清單，錯誤: {e}")
-
-async def crawl_links_async(links, base_url):
-    websites = []
-    tasks = [process_link(link, base_url, websites) for link in links]
-    await asyncio.gather(*tasks)
+    print("Link status cache stats: ", link_prober.cache.stats())
     return websites
 
+def get_link_graph():
+    """Get the site link graph written by the crawler."""
+    return shared_instance(LinkGraph, "Search Executor", "website_links_crawler", "link_graph")
+
 @tool
-def website_links_crawler(link: str) -> str:
+async def website_links_crawler(link: str) -> str:
     """Takes url of a website and reads the HTML content of the website and then extracts all the links on that website."""
     print("=" * 10 + " Website Links Crawler " + "=" * 10)
     
     extract_link = re.search(r'(https?://[^\]]+)', link)
     url = extract_link.group(1) if extract_link else None
-    
+    if url is None:
+        print(f"無法從 [{link}] 取得網址")
+        return f"Can not access [{link}] . Error: no http(s) url found"
+    canonical_url = UrlCanonicalizer().canonicalize(url)
+
+    # *爬蟲已記錄且未過期的網頁直接由連結圖回答，不需重新下載網頁
+    # *連結狀態快取中仍有效的連結不再測試，狀態未知或已過期的連結重新測試
+    link_graph = get_link_graph()
+    entry = await asyncio.to_thread(link_graph.get, canonical_url) if canonical_url else None
+    if entry is not None:
+        websites = await crawl_links_async(entry["links"])
+        crawled_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["crawled_at"]))
+        print(f"由連結圖取得 [{url}] 中共{len(websites)}個連結，爬取時間: {crawled_at}")
+
+        result = "\n".join([f"[{item['title']}]: [{item['link']}]" for item in websites])
+        print(result)
+        return result
+
     try:
-        response = requests.get(url, verify=False, timeout=1)
-        encoding = response.apparent_encoding
-        response.encoding = encoding
-    except requests.exceptions.RequestException as e:
+        response = await fetch_with_cache(url)
+        status = response["status"]
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
         print(f"無法獲取 [{url}] 。錯誤: {e}")
         return f"Can not access [{url}] . Error: {e}"
 
-    websites = []
-    result = ""
-    if response.status_code == 200:
-        page_content = response.text
-        soup = BeautifulSoup(page_content, 'html.parser')
-        links = soup.find_all('a', href=True) # 找出所有超連結 # TODO 讀取iframe有問題
-
-        print(page_content)
-        print(len(links))
-
-        websites = asyncio.run(crawl_links_async(links, url))
-        # websites = await crawl_links_async(links, url)
+    if status == 200:
+        page_content = decode_html(response["body"], response["charset"])
+        outlinks = await asyncio.to_thread(extract_links, page_content, url) # HTML 解析為 CPU 工作，放到執行緒執行
+        if canonical_url:
+            # *記錄完整的連結，讀取連結圖時再測試；測試逾時或暫時失敗的連結不會因此遺失
+            await asyncio.to_thread(link_graph.put, canonical_url, outlinks)
+        websites = await crawl_links_async(outlinks)
         print(f"成功獲取 [{url}] 中共{len(websites)}個連結。")
 
         result = "\n".join([f"[{item['title']}]: [{item['link']}]" for item in websites])
         print(result)
         return result
     else:
-        print(f"無法獲取 [{url}] 。HTTP 狀態碼: {response.status_code}")
-        return f"Can not access [{url}] . HTTP status code: {response.status_code}"
+        print(f"無法獲取 [{url}] 。HTTP 狀態碼: {status}")
+        return f"Can not access [{url}] . HTTP status code: {status}"
+
+def extract_website_text(body, charset):
+    # 快取完整內文，字數上限在回傳時才套用，讓 query 模式能檢索整頁
+    return extract_main_text(decode_html(body, charset), max_chars=0)
+
+@lru_cache(maxsize=None)
+def get_website_reader_max_chars():
+    return read_tool_config("Search Executor", "website_reader").get("max_chars", 20000)
+
+@lru_cache(maxsize=None)
+def get_passage_selector():
+    return PassageSelector(**read_tool_config("Search Executor", "passage_selector"))
+
+def parse_cursor(cursor):
+    try:
+        return max(0, int(cursor)) if cursor else 0
+    except ValueError:
+        return 0
+
+def format_passages(tool_name, query, passages, cursor, total, matched, location):
+    """
+    Formats the selected passages with their offsets and a continuation hint for the next passages.
+    location formats the position of a passage from its metadata.
+    """
+    if not passages:
+        return f"No more passages. All {total} passages relevant to the query have been returned."
+
+    lines = [] if matched else ["[No passage matched the query. Passages are returned in page order.]"]
+    for rank, passage in enumerate(passages, start=cursor + 1):
+        lines.append(f"[Passage {rank}, {location(passage.metadata)}]\n{passage.page_content}")
+    next_cursor = cursor + len(passages)
+    if next_cursor < total:
+        lines.append(f"[Showing passages {cursor + 1}-{next_cursor} of {total}. Call {tool_name} with the same query and cursor=\"{next_cursor}\" to read more.]")
+    return "\n".join(lines)
+
+@lru_cache(maxsize=None)
+def get_snapshot_store():
+    """Get the page snapshot store written by the crawler, or None when it is not configured."""
+    if not read_tool_config("Search Executor", "snapshot_store"):
+        return None
+    return shared_instance(SnapshotStore, "Search Executor", "snapshot_store")
+
+async def read_snapshot(url, kind):
+    """Returns the fresh snapshot ("html" or "pdf") of the url, or None to read the page live."""
+    snapshot_store = get_snapshot_store()
+    canonical_url = UrlCanonicalizer().canonicalize(url)
+    if snapshot_store is None or canonical_url is None:
+        return None
+    snapshot = await asyncio.to_thread(snapshot_store.get, canonical_url)
+    if snapshot is None or snapshot["kind"] != kind:
+        return None
+    return snapshot
+
+def format_snapshot_freshness(snapshot):
+    crawled_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["fetched_at"]))
+    return f"[Snapshot crawled at {crawled_at}, {snapshot['age'] / 3600:.1f} hours ago]"
 
 @tool
-def website_reader(url: str) -> str:
-    """Takes url of a website and read the HTML content of a website."""
+async def website_reader(url: str, query: str = "", cursor: str = "") -> str:
+    """
+    Takes url of a website and read the HTML content of a website.
+    query: optional. When set, only the passages of the page most relevant to the query are returned, which is preferred for long pages.
+    cursor: the cursor given in a previous result to read the next passages for the same query.
+    """
     print("=" * 10 + " Website Reader " + "=" * 10)
 
-    try: 
-        response = requests.get(url, verify=False)
-        encoding = response.apparent_encoding
-        response.encoding = encoding
-    except requests.exceptions.RequestException as e:
-        print(f"無法獲取 [{url}] 。錯誤: {e}")
-        return f"Can not access [{url}] . Error: {e}"
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-    content = soup.get_text()
-    cleaned_content = "\n".join([line for line in content.split("\n") if line.strip()])
-    
-    print(f"成功讀取 [{url}] 內文：\n{cleaned_content}")
-    return cleaned_content
+    # *爬蟲留有未過期的全文快照時直接使用，不需連線
+    snapshot = await read_snapshot(url, "html")
+    if snapshot is not None:
+        cleaned_content = snapshot["text"]
+    else:
+        try: 
+            response = await fetch_with_cache(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
+            print(f"無法獲取 [{url}] 。錯誤: {e}")
+            return f"Can not access [{url}] . Error: {e}"
+        if response["status"] != 200:
+            print(f"無法獲取 [{url}] 。HTTP 狀態碼: {response['status']}")
+            return f"Can not access [{url}] . HTTP status code: {response['status']}"
+
+        # *快取命中時直接使用先前抽取的內文，略過 HTML 解析
+        http_cache = get_http_cache()
+        cleaned_content = http_cache.get_text(response["key"], "main_text")
+        if cleaned_content is None:
+            cleaned_content = await asyncio.to_thread(extract_website_text, response["body"], response["charset"]) # 解碼與解析皆為 CPU 工作
+            http_cache.put_text(response["key"], "main_text", cleaned_content)
+
+    if query:
+        # *只回傳與 query 最相關的段落，減少後續 LLM 呼叫攜帶的 token
+        passage_selector = get_passage_selector()
+        passages = await asyncio.to_thread(passage_selector.split, cleaned_content)
+        cursor = parse_cursor(cursor)
+        selected, total, matched = await asyncio.to_thread(passage_selector.select, passages, query, cursor)
+        result = format_passages("website_reader", query, selected, cursor, total, matched,
+                                 lambda metadata: f"characters {metadata['start']}-{metadata['end']}")
+    else:
+        result = truncate_text(cleaned_content, get_website_reader_max_chars())
+    if snapshot is not None:
+        result = format_snapshot_freshness(snapshot) + "\n" + result
 
-@tool
-def pdf_reader(url: str) -> str:
-    """Takes url of a PDF file and read the content of a PDF file."""
-    try: 
-        response = requests.get(url)
-        encoding = response.apparent_encoding
-        response.encoding = encoding
-    except requests.exceptions.RequestException as e:
-        print(f"無法獲取PDF。錯誤: {e}")
-        return f"Can not access PDF. Error: {e}"
-
-    if response.status_code == 200:
-        pdf_file = BytesIO(response.content)
-        
-        with pdfplumber.open(pdf_file) as pdf:
-            pdf_text = ""
-            for page in pdf.pages:
-                pdf_text += page.extract_text()
+    print(f"成功讀取 [{url}] 內文：\n{result}")
+    return result
+
+def get_pdf_extractor():
+    """Get the process-wide PDF extractor and its process pool."""
+    return shared_instance(PdfExtractor, "Search Executor", "pdf_reader")
+
+def format_page_numbers(page_numbers):
+    """Formats sorted page numbers as ranges, e.g. [1, 2, 3, 7] -> "1-3,7"."""
+    ranges = []
+    start = previous = page_numbers[0]
+    for page_number in page_numbers[1:] + [None]:
+        if page_number is not None and page_number == previous + 1:
+            previous = page_number
+            continue
+        ranges.append(f"{start}-{previous}" if start != previous else f"{start}")
+        if page_number is not None:
+            start = previous = page_number
+    return ",".join(ranges)
 
-        print(f"成功讀取 [{url}] 內文：\n{pdf_text}")
-        return pdf_text
+@tool
+async def pdf_reader(url: str, pages: str = "", query: str = "", cursor: str = "") -> str:
+    """
+    Takes url of a PDF file and read the content of a PDF file.
+    pages: the pages to read, e.g. "1-5" or "3,8-10". Leave it empty to read the first pages; the result tells how to read the remaining pages.
+    query: optional. When set, only the passages most relevant to the query are returned from the selected pages (or from the first pages of a long PDF when pages is empty).
+    cursor: the cursor given in a previous result to read the next passages for the same query.
+    """
+    pdf_extractor = get_pdf_extractor()
+    max_pages = pdf_extractor.max_query_pages if query else pdf_extractor.max_pages
+
+    # *爬蟲留有未過期的全文快照時直接使用，快照以換頁字元分隔各頁
+    snapshot = await read_snapshot(url, "pdf")
+    if snapshot is not None:
+        page_texts = {str(page_number): text for page_number, text in enumerate(snapshot["text"].split("\f"), start=1)}
+        page_count = len(page_texts)
+        try:
+            page_numbers = parse_page_range(pages, page_count, max_pages)
+        except ValueError as e:
+            return f"Invalid pages argument [{pages}]. Error: {e}"
     else:
-        print(f"PDF下載失敗，HTTP 狀態碼: {response.status_code}")
-        return f"PDF download failed, HTTP status code: {response.status_code}"
-    
+        http_cache = get_http_cache()
+        try: 
+            # *PDF 下載不套用共用 session 的總逾時，改以較長的總時限與讀取間隔逾時判斷連線是否停滯
+            download_timeout = aiohttp.ClientTimeout(total=pdf_extractor.download_timeout, sock_connect=SharedHttpClient.timeout,
+                                                     sock_read=pdf_extractor.download_read_timeout)
+            response = await http_cache.fetch_file(SharedHttpClient.get_session(), url, max_bytes=pdf_extractor.max_bytes, timeout=download_timeout)
+            status = response["status"]
+        except ResponseTooLargeError as e:
+            print(f"PDF檔案過大，無法讀取。錯誤: {e}")
+            return f"PDF is too large to read. Error: {e}"
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError) as e:
+            print(f"無法獲取PDF。錯誤: {e}")
+            return f"Can not access PDF. Error: {e}"
+
+        if status != 200:
+            print(f"PDF下載失敗，HTTP 狀態碼: {status}")
+            return f"PDF download failed, HTTP status code: {status}"
+
+        # *已抽取過的頁面快取在 PDF 旁，只抽取尚未讀過的頁面
+        cached_pdf = json.loads(http_cache.get_text(response["key"], "pdf_pages") or "{}")
+        page_texts = cached_pdf.get("pages", {})
+        try:
+            page_count = cached_pdf.get("page_count") or await asyncio.to_thread(count_pages, response["path"])
+            page_numbers = parse_page_range(pages, page_count, max_pages)
+            missing_page_numbers = [page_number for page_number in page_numbers if str(page_number) not in page_texts]
+            if missing_page_numbers:
+                extracted = await pdf_extractor.extract(response["path"], missing_page_numbers)
+                page_texts.update({str(page_number): text for page_number, text in extracted.items()})
+                http_cache.put_text(response["key"], "pdf_pages", json.dumps({"page_count": page_count, "pages": page_texts}, ensure_ascii=False))
+        except ValueError as e:
+            return f"Invalid pages argument [{pages}]. Error: {e}"
+        except Exception as e:
+            print(f"無法讀取PDF。錯誤: {e}")
+            return f"Can not read PDF. Error: {e}"
+
+    if not page_numbers:
+        return f"No pages selected. The PDF has {page_count} pages."
+
+    if query:
+        passage_selector = get_passage_selector()
+        passages = []
+        for page_number in page_numbers:
+            passages.extend(passage_selector.split(page_texts[str(page_number)], {"page": page_number}))
+        cursor = parse_cursor(cursor)
+        selected, total, matched = await asyncio.to_thread(passage_selector.select, passages, query, cursor)
+        pdf_text = format_passages("pdf_reader", query, selected, cursor, total, matched,
+                                   lambda metadata: f"page {metadata['page']}/{page_count}, characters {metadata['start']}-{metadata['end']}")
+        if page_numbers[-1] < page_count:
+            pdf_text += f"\n[Searched pages {format_page_numbers(page_numbers)} of {page_count}. Set pages to search the remaining pages.]"
+    else:
+        pdf_text = "\n".join(f"[Page {page_number}/{page_count}]\n{page_texts[str(page_number)]}" for page_number in page_numbers)
+        if page_numbers[-1] < page_count:
+            next_page = page_numbers[-1] + 1
+            next_pages = f"{next_page}-{min(page_count, next_page + pdf_extractor.max_pages - 1)}"
+            pdf_text += f"\n[Read pages {format_page_numbers(page_numbers)} of {page_count}. Call pdf_reader with pages=\"{next_pages}\" to read more.]"
+    if snapshot is not None:
+        pdf_text = format_snapshot_freshness(snapshot) + "\n" + pdf_text
+
+    print(f"成功讀取 [{url}] 內文：\n{pdf_text}")
+    return pdf_text
 
 
 if __name__ == "__main__":
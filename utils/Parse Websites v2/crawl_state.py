@@ -0,0 +1,86 @@
+import json
+import time
+import sqlite3
+
+class CrawlState():
+    """
+    SQLite checkpoint of a crawl: the frontier and the per-URL fetch state.
+    The frontier lets an interrupted crawl resume where it stopped, and the per-URL state
+    (ETag, Last-Modified, content hash, last summary time) makes recrawls conditional.
+    """
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.conn = sqlite3.connect(state_file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "link TEXT PRIMARY KEY, title TEXT, depth INTEGER, done INTEGER DEFAULT 0)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS url_state ("
+            "link TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, links TEXT, "
+            "last_fetch_time REAL, last_summary_time REAL)"
+        )
+        self.conn.commit()
+
+    def has_pending(self):
+        return self.conn.execute("SELECT 1 FROM frontier WHERE done = 0 LIMIT 1").fetchone() is not None
+
+    def reset_frontier(self):
+        self.conn.execute("DELETE FROM frontier")
+        self.conn.commit()
+
+    def get_frontier(self):
+        """
+        Returns all links in the frontier and the pending tasks of the interrupted crawl.
+        """
+        seen = set()
+        pending = []
+        for link, title, depth, done in self.conn.execute("SELECT link, title, depth, done FROM frontier ORDER BY rowid"):
+            seen.add(link)
+            if not done:
+                pending.append({"link": link, "title": title, "depth": depth})
+        return seen, pending
+
+    def add_to_frontier(self, link, title, depth):
+        self.conn.execute("INSERT OR IGNORE INTO frontier (link, title, depth) VALUES (?, ?, ?)", (link, title, depth))
+        self.conn.commit()
+
+    def mark_done(self, link):
+        self.conn.execute("UPDATE frontier SET done = 1 WHERE link = ?", (link,))
+        self.conn.commit()
+
+    def get_url_state(self, link):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, links, last_fetch_time, last_summary_time FROM url_state WHERE link = ?",
+            (link,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, content_hash, links, last_fetch_time, last_summary_time = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "links": json.loads(links) if links else [],
+            "last_fetch_time": last_fetch_time,
+            "last_summary_time": last_summary_time,
+        }
+
+    def update_url_state(self, link, etag, last_modified, content_hash, links, summarized):
+        now = time.time()
+        previous = self.get_url_state(link)
+        last_summary_time = now if summarized else (previous["last_summary_time"] if previous else None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO url_state (link, etag, last_modified, content_hash, links, last_fetch_time, last_summary_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (link, etag, last_modified, content_hash, json.dumps(links, ensure_ascii=False), now, last_summary_time)
+        )
+        self.conn.commit()
+
+    def touch(self, link):
+        self.conn.execute("UPDATE url_state SET last_fetch_time = ? WHERE link = ?", (time.time(), link))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
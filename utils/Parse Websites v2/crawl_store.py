@@ -0,0 +1,94 @@
+import os
+import json
+
+class CrawlStore():
+    """
+    Append-only JSONL store of the crawled website summaries.
+    Each record is written as one line and fsynced, so a crash loses at most the line being written.
+    A later record with the same link replaces the earlier one.
+    """
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self.records = {}
+        self.load()
+        self.file = open(store_file, "a", encoding="utf-8")
+
+    def load(self):
+        """
+        Builds the link index from the store file and truncates a partially written last line.
+        """
+        if not os.path.exists(self.store_file):
+            return
+
+        valid_offset = 0
+        with open(self.store_file, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self.records[record["link"]] = record
+                valid_offset += len(line)
+
+        if valid_offset != os.path.getsize(self.store_file):
+            print(f"{self.store_file} 最後一筆資料不完整，已截斷")
+            with open(self.store_file, "r+b") as f:
+                f.truncate(valid_offset)
+
+    def contains(self, link):
+        return link in self.records
+
+    def get(self, link):
+        return self.records.get(link)
+
+    def add(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records[record["link"]] = record
+
+    def __len__(self):
+        return len(self.records)
+
+    def import_json(self, json_file, canonicalize=None):
+        """
+        Imports the records of an office_websites_summary JSON file that are not in the store yet.
+        If canonicalize is given, the links are canonicalized before importing.
+        """
+        with open(json_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for record in data:
+            if canonicalize is not None:
+                record["link"] = canonicalize(record["link"]) or record["link"]
+            if not self.contains(record["link"]):
+                self.add(record)
+        print(f"已從 {json_file} 匯入資料，目前共 {len(self)} 筆")
+
+    def export_json(self, json_file):
+        """
+        Exports the latest record of every link in the office_websites_summary JSON format read by vector_store.py.
+        """
+        temp_path = json_file + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.records.values()), f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, json_file)
+        print(f"已匯出 {len(self)} 筆資料至 {json_file}")
+
+    def compact(self):
+        """
+        Rewrites the store file with only the latest record of every link.
+        """
+        self.file.close()
+        temp_path = self.store_file + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for record in self.records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.store_file)
+        self.file = open(self.store_file, "a", encoding="utf-8")
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,369 @@
+import os
+import time
+import asyncio
+import hashlib
+from urllib.parse import urlparse
+
+import yaml
+import aiohttp
+
+from BFS_websites import website_crawler, read_pdf_pages, read_website_text
+from crawl_store import CrawlStore
+from crawl_state import CrawlState
+from summarizer import SummarizationPipeline, SummarizationError
+from dedupe import NearDuplicateIndex, simhash
+from utils.url_canonicalizer import UrlCanonicalizer
+from utils.link_graph import LinkGraph
+from utils.snapshot_store import SnapshotStore
+from utils.html_extractor import decode_html, extract_main_text
+
+crawl_config_yaml_path = "crawl_config.yaml"
+
+class PageHandler():
+    """
+    Base class of the page handlers, which turn a fetched page into text, outgoing links and
+    the cleaned full text kept as the page snapshot.
+    A page that cannot be read is returned with its error message in "error" (None on success).
+    """
+    def can_handle(self, url, content_type):
+        raise NotImplementedError
+
+    async def handle(self, url, body, charset):
+        raise NotImplementedError
+
+class HtmlPageHandler(PageHandler):
+    def can_handle(self, url, content_type):
+        return "html" in content_type or content_type == ""
+
+    async def handle(self, url, body, charset):
+        # 解碼一次 (含 meta charset 偵測)，內文、連結與快照共用
+        page_content = await asyncio.to_thread(decode_html, body, charset)
+        # BeautifulSoup 解析為 CPU 工作，放到執行緒避免阻塞 event loop
+        try:
+            text = await asyncio.to_thread(read_website_text, page_content)
+        except Exception as e:
+            return {"text": "", "links": [], "kind": "html", "snapshot": None, "error": str(e)}
+        links = await asyncio.to_thread(website_crawler, page_content, url)
+        # 快照使用與 website_reader 相同的內文抽取，去除選單、頁尾等樣板內容
+        snapshot = await asyncio.to_thread(extract_main_text, page_content, 0)
+        return {"text": text, "links": links, "kind": "html", "snapshot": snapshot, "error": None}
+
+class PdfPageHandler(PageHandler):
+    def can_handle(self, url, content_type):
+        return "pdf" in content_type or "pdf" in url.lower()
+
+    async def handle(self, url, body, charset):
+        try:
+            page_texts = await asyncio.to_thread(read_pdf_pages, body)
+        except Exception as e:
+            return {"text": "", "links": [], "kind": "pdf", "snapshot": None, "error": str(e)}
+        text = "".join(page_texts)
+        if text == "":
+            return {"text": "", "links": [], "kind": "pdf", "snapshot": None, "error": "無法讀取PDF內容"}
+        # 快照以換頁字元分隔各頁，pdf_reader 可以依頁碼讀取
+        return {"text": text, "links": [], "kind": "pdf", "snapshot": "\f".join(page_texts), "error": None}
+
+class CrawlerEngine():
+    """
+    Asynchronous BFS crawler over the office websites.
+    Pages are pulled from a shared frontier queue by a pool of workers, fetched through one connection pool
+    with per-host concurrency and politeness limits, and dispatched to the matching page handler.
+    With a CrawlState the frontier is checkpointed for resuming, pages are fetched with conditional GETs,
+    and pages whose content hash has not changed are not summarized again.
+    With a NearDuplicateIndex, pages whose text is a near-duplicate of a stored page are recorded as
+    alias links of that canonical page instead of being summarized.
+    With a LinkGraph, the outlinks of every crawled page are recorded for website_links_crawler.
+    With a SnapshotStore, the cleaned full text of every page is kept for website_reader and pdf_reader.
+    """
+    def __init__(self, store, summarizer, state=None, duplicate_index=None, link_graph=None, snapshot_store=None, handlers=None, max_depth=3, max_concurrency=16,
+                 per_host_concurrency=4, politeness_delay=0.5, request_timeout=10, dedupe_min_text_length=200):
+        self.store = store
+        self.summarizer = summarizer
+        self.state = state
+        self.duplicate_index = duplicate_index
+        self.link_graph = link_graph
+        self.snapshot_store = snapshot_store
+        self.dedupe_min_text_length = dedupe_min_text_length
+        self.handlers = handlers or [PdfPageHandler(), HtmlPageHandler()]
+        self.max_depth = max_depth
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.politeness_delay = politeness_delay
+        self.request_timeout = request_timeout
+
+        self.frontier = None
+        self.canonicalizer = UrlCanonicalizer()
+        self.seen = set()
+        self.host_semaphores = {}
+        self.host_last_request = {}
+        self.pending_aliases = {}
+
+        if self.duplicate_index is not None:
+            for record in self.store.records.values():
+                if record.get("simhash"):
+                    self.duplicate_index.add(record["link"], int(record["simhash"], 16))
+
+        self.fetched_count = 0
+        self.not_modified_count = 0
+        self.unchanged_count = 0
+        self.duplicate_count = 0
+        self.summarized_count = 0
+        self.failed_count = 0
+
+    def enqueue(self, link, title, depth):
+        link = self.canonicalizer.canonicalize(link)
+        if link is None or link in self.seen:
+            return
+        self.seen.add(link)
+        if self.state is not None:
+            self.state.add_to_frontier(link, title, depth)
+        self.frontier.put_nowait({"link": link, "title": title, "depth": depth})
+
+    async def wait_for_host(self, host):
+        """
+        Waits until the politeness delay since the last request to the host has passed.
+        """
+        while True:
+            now = time.monotonic()
+            next_time = self.host_last_request.get(host, 0.0) + self.politeness_delay
+            if now >= next_time:
+                self.host_last_request[host] = now
+                return
+            await asyncio.sleep(next_time - now)
+
+    async def fetch(self, session, url, url_state=None):
+        """
+        Fetches the url, sending If-None-Match / If-Modified-Since when the previous fetch state is known.
+        """
+        headers = {}
+        if url_state is not None:
+            if url_state["etag"]:
+                headers["If-None-Match"] = url_state["etag"]
+            if url_state["last_modified"]:
+                headers["If-Modified-Since"] = url_state["last_modified"]
+
+        host = urlparse(url).netloc
+        semaphore = self.host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        async with semaphore:
+            await self.wait_for_host(host)
+            async with session.get(url, ssl=False, headers=headers) as response:
+                body = await response.read()
+                return {
+                    "status": response.status,
+                    "content_type": response.content_type or "",
+                    "charset": response.charset,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "body": body,
+                }
+
+    def get_handler(self, url, content_type):
+        for handler in self.handlers:
+            if handler.can_handle(url, content_type):
+                return handler
+        return None
+
+    async def process(self, session, task):
+        link, title, depth = task["link"], task["title"], task["depth"]
+        url_state = self.state.get_url_state(link) if self.state is not None else None
+        # 只有已經總結過的網頁才送出條件式請求，否則 304 會讓網頁永遠沒有總結
+        conditional = url_state is not None and self.store.contains(link)
+
+        try:
+            response = await self.fetch(session, link, url_state if conditional else None)
+        except Exception as e:
+            self.failed_count += 1
+            print(f"無法獲取 [{title}]: [{link}] 。錯誤: {e}")
+            return
+
+        if response["status"] == 304 and conditional:
+            # *網頁未修改，沿用上次的連結繼續爬取
+            self.not_modified_count += 1
+            self.state.touch(link)
+            if self.snapshot_store is not None:
+                self.snapshot_store.touch(link)
+            print(f'"[{title}]: [{link}] 未修改，跳過總結"')
+            links = url_state["links"]
+        elif response["status"] != 200:
+            self.failed_count += 1
+            print(f"無法獲取 [{title}]: [{link}] 。錯誤: {response['status']}")
+            return
+        else:
+            self.fetched_count += 1
+            handler = self.get_handler(link, response["content_type"])
+            if handler is None:
+                print(f"不支援的內容類型 [{response['content_type']}]: [{link}]")
+                return
+            page = await handler.handle(link, response["body"], response["charset"])
+            links = page["links"]
+            if self.snapshot_store is not None and page["error"] is None and page["snapshot"]:
+                self.snapshot_store.put(link, page["snapshot"], page["kind"])
+
+            # 讀取網頁並總結內容，內容雜湊未改變的網頁不再重新總結
+            content_hash = hashlib.sha256(page["text"].encode("utf-8")).hexdigest()
+            summarized = False
+            if page["error"] is not None:
+                self.failed_count += 1
+                content_hash = None
+                print(f"無法讀取 [{title}]: [{link}] 。錯誤: {page['error']}")
+            elif self.store.contains(link) and url_state is not None and url_state["content_hash"] == content_hash:
+                self.unchanged_count += 1
+                print(f'"[{title}]: [{link}] 內容未改變，跳過總結"')
+            elif self.store.contains(link) and url_state is None:
+                print(f'"[{title}]: [{link}] 已經被讀取過"')
+            else:
+                # *以去除選單、頁尾等樣板後的內文計算指紋，避免共用版型的網頁被誤判為重複
+                fingerprint = self.get_fingerprint(page["snapshot"] or "")
+                canonical_link = self.duplicate_index.find(fingerprint, exclude=link) if fingerprint is not None else None
+                if canonical_link is not None:
+                    # *近似重複的網頁不再總結，記錄為原網頁的別名連結
+                    self.add_alias(canonical_link, {"link": link, "title": title, "text": page["text"], "fingerprint": fingerprint})
+                    self.duplicate_count += 1
+                    print(f'"[{title}]: [{link}] 與 [{canonical_link}] 內容近似，記錄為別名連結"')
+                else:
+                    summarized = await self.summarize_page(link, title, page["text"], fingerprint)
+                    if not summarized:
+                        content_hash = None
+
+            if self.state is not None:
+                self.state.update_url_state(link, response["etag"], response["last_modified"], content_hash, links, summarized)
+
+        if self.link_graph is not None:
+            self.link_graph.put(link, links)
+
+        # 繼續爬取網頁內的所有連結
+        if depth < self.max_depth:
+            for website in links:
+                self.enqueue(website["link"], website["title"], depth + 1)
+
+    def get_fingerprint(self, text):
+        if self.duplicate_index is None or len(text.strip()) < self.dedupe_min_text_length:
+            return None
+        return simhash(text)
+
+    def add_alias(self, canonical_link, alias_page):
+        """
+        Records alias_page ({"link", "title", "text", "fingerprint"}) as an alias link of the canonical page.
+        """
+        record = self.store.get(canonical_link)
+        if record is None:
+            # 原網頁仍在總結中，寫入後再合併別名連結；保留內文，原網頁總結失敗時改為總結別名網頁
+            self.pending_aliases.setdefault(canonical_link, []).append(alias_page)
+            return
+        aliases = record.get("aliases", [])
+        if alias_page["link"] not in aliases:
+            self.store.add({**record, "aliases": aliases + [alias_page["link"]]})
+
+    async def summarize_page(self, link, title, text, fingerprint):
+        # 先登記指紋，避免同時處理的近似網頁都被總結
+        if fingerprint is not None:
+            self.duplicate_index.add(link, fingerprint)
+
+        try:
+            summary = await self.summarizer.summarize(text)
+        except SummarizationError as e:
+            print(f"無法總結 [{title}]: [{link}] 。錯誤: {e}")
+            if fingerprint is not None:
+                self.duplicate_index.remove(link)
+            # *等待合併的別名網頁改由第一個別名代替原網頁總結，其餘成為它的別名
+            pending = self.pending_aliases.pop(link, [])
+            if pending:
+                alias_page, others = pending[0], pending[1:]
+                self.duplicate_count -= 1
+                self.pending_aliases.setdefault(alias_page["link"], []).extend(others)
+                await self.summarize_page(alias_page["link"], alias_page["title"], alias_page["text"], alias_page["fingerprint"])
+            return False
+
+        record = {"title": title, "link": link, "summary": summary}
+        if fingerprint is not None:
+            record["simhash"] = f"{fingerprint:016x}"
+        previous = self.store.get(link)
+        aliases = (previous.get("aliases", []) if previous is not None else []) + [alias_page["link"] for alias_page in self.pending_aliases.pop(link, [])]
+        if aliases:
+            record["aliases"] = list(dict.fromkeys(aliases))
+        self.store.add(record)
+        self.summarized_count += 1
+        print(f'"成功讀取 [{title}]: [{link}] 並總結內容後寫入"')
+        print('目前成功處理的網頁總量: ' + str(len(self.store)))
+        if self.summarized_count % 50 == 0:
+            print(f"Summarization stats: {self.summarizer.stats()}")
+        return True
+
+    async def worker(self, session):
+        while True:
+            task = await self.frontier.get()
+            try:
+                await self.process(session, task)
+            except Exception as e:
+                self.failed_count += 1
+                print(f"處理 [{task['title']}]: [{task['link']}] 時發生錯誤: {e}")
+            finally:
+                # 被取消 (中斷) 的網頁保持待處理狀態，下次繼續
+                if self.state is not None and not asyncio.current_task().cancelling():
+                    self.state.mark_done(task["link"])
+                self.frontier.task_done()
+
+    async def crawl(self, seeds):
+        """
+        Crawls from the seed websites ({"title", "link"}) until the frontier is empty.
+        If the checkpointed frontier still has pending pages, the interrupted crawl is resumed instead.
+        """
+        start_time = time.perf_counter()
+        self.frontier = asyncio.Queue()
+        if self.state is not None and self.state.has_pending():
+            self.seen, pending = self.state.get_frontier()
+            print(f"從中斷處繼續爬取，尚有 {len(pending)} 個網頁待處理")
+            for task in pending:
+                self.frontier.put_nowait(task)
+        else:
+            if self.state is not None:
+                self.state.reset_frontier()
+            for seed in seeds:
+                self.enqueue(seed["link"], seed["title"], 1)
+
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_concurrency, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [asyncio.create_task(self.worker(session)) for _ in range(self.max_concurrency)]
+            await self.frontier.join()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        elapsed = time.perf_counter() - start_time
+        print(f"爬取完成：共讀取 {self.fetched_count} 個網頁，未修改 {self.not_modified_count} 個，內容未改變 {self.unchanged_count} 個，近似重複 {self.duplicate_count} 個，"
+              f"總結 {self.summarized_count} 個，失敗 {self.failed_count} 個，耗時 {elapsed:.1f} 秒")
+        print(f"Summarization stats: {self.summarizer.stats()}")
+
+def read_crawl_config_yaml():
+    with open(crawl_config_yaml_path, 'r', encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+if __name__ == "__main__":
+    crawl_config = read_crawl_config_yaml()
+
+    store = CrawlStore(crawl_config["store_file"])
+    if len(store) == 0 and os.path.exists(crawl_config["output_file"]):
+        store.import_json(crawl_config["output_file"], canonicalize=UrlCanonicalizer().canonicalize)
+
+    state = CrawlState(crawl_config["state_file"])
+    summarizer = SummarizationPipeline(**crawl_config["summarizer"])
+    duplicate_index = NearDuplicateIndex(**crawl_config["dedupe"])
+    link_graph = LinkGraph(crawl_config["link_graph_file"])
+    snapshot_store = SnapshotStore(crawl_config["snapshot_directory"])
+    engine = CrawlerEngine(store, summarizer, state, duplicate_index, link_graph, snapshot_store, **crawl_config["crawler"])
+    asyncio.run(engine.crawl(crawl_config["offices"]))
+    state.close()
+    link_graph.close()
+
+    # 被取代的舊快照超過一半時重寫資料檔
+    if snapshot_store.dead_bytes_ratio() > 0.5:
+        snapshot_store.compact()
+    snapshot_store.close()
+
+    # 匯出成 vector_store.py 讀取的 JSON 格式
+    store.export_json(crawl_config["output_file"])
+    store.close()
+
+    print()
+    print("BFS完成！")
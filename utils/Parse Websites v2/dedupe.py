@@ -0,0 +1,77 @@
+import re
+import hashlib
+from collections import Counter
+
+def simhash(text, shingle_size=4):
+    """
+    Computes the 64-bit simhash of the text over character shingles, ignoring whitespace.
+    """
+    text = re.sub(r"\s+", "", text.lower())
+    if len(text) <= shingle_size:
+        shingles = Counter([text])
+    else:
+        shingles = Counter(text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1))
+
+    weights = [0] * 64
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+class NearDuplicateIndex():
+    """
+    Index of simhash fingerprints for finding near-duplicate pages.
+    The 64 bits are split into max_distance + 1 bands, so by the pigeonhole principle two fingerprints
+    within max_distance bits of each other share at least one identical band.
+    """
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.band_count = max_distance + 1
+        self.band_bits = 64 // self.band_count
+        self.bands = [{} for _ in range(self.band_count)]
+        self.fingerprints = {}
+
+    def get_band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (i * self.band_bits)) & mask for i in range(self.band_count)]
+
+    def add(self, link, fingerprint):
+        self.remove(link)
+        self.fingerprints[link] = fingerprint
+        for band, key in zip(self.bands, self.get_band_keys(fingerprint)):
+            band.setdefault(key, set()).add(link)
+
+    def remove(self, link):
+        fingerprint = self.fingerprints.pop(link, None)
+        if fingerprint is None:
+            return
+        for band, key in zip(self.bands, self.get_band_keys(fingerprint)):
+            band[key].discard(link)
+            if not band[key]:
+                del band[key]
+
+    def find(self, fingerprint, exclude=None):
+        """
+        Returns the link of the closest indexed page within max_distance, or None.
+        """
+        best_link, best_distance = None, self.max_distance + 1
+        for band, key in zip(self.bands, self.get_band_keys(fingerprint)):
+            for link in band.get(key, ()):
+                if link == exclude:
+                    continue
+                distance = hamming_distance(fingerprint, self.fingerprints[link])
+                if distance < best_distance:
+                    best_link, best_distance = link, distance
+        return best_link
@@ -0,0 +1,134 @@
+import time
+import random
+import asyncio
+
+import openai
+import tiktoken
+from langchain_openai import ChatOpenAI
+
+SUMMARY_PROMPT = "請總結以下內容：\n\n{content}"
+REDUCE_PROMPT = "以下是同一份文件各段落的摘要，請整合成一份完整的總結：\n\n{content}"
+
+class SummarizationError(Exception):
+    pass
+
+class SummarizationPipeline():
+    """
+    Asynchronous summarization stage of the crawler.
+    All pages share one ChatOpenAI client, and at most `concurrency` LLM calls run at the same time.
+    Inputs longer than `max_input_tokens` are split into token chunks, summarized separately (map)
+    and then merged into one summary (reduce).
+    """
+    def __init__(self, model="gpt-4o-mini", concurrency=4, max_input_tokens=12000, chunk_tokens=6000,
+                 chunk_overlap_tokens=200, max_retries=6, request_timeout=120):
+        self.model = model
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.max_retries = max_retries
+
+        # 重試由 pipeline 自行處理，避免和 client 內建的重試疊加
+        self.llm = ChatOpenAI(model=model, max_retries=0, timeout=request_timeout)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        try:
+            self.encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            self.encoding = tiktoken.get_encoding("o200k_base")
+
+        self.start_time = time.perf_counter()
+        self.page_count = 0
+        self.llm_call_count = 0
+        self.retry_count = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text))
+
+    def split_tokens(self, text):
+        """
+        Splits the text into chunks of at most chunk_tokens tokens.
+        """
+        tokens = self.encoding.encode(text)
+        step = self.chunk_tokens - self.chunk_overlap_tokens
+        return [self.encoding.decode(tokens[i:i + self.chunk_tokens]) for i in range(0, len(tokens), step)]
+
+    async def call_llm(self, prompt):
+        """
+        Calls the LLM with exponential backoff on rate limits, timeouts and server errors.
+        """
+        async with self.semaphore:
+            for attempt in range(self.max_retries):
+                try:
+                    response = await self.llm.ainvoke([("human", prompt)])
+                    break
+                except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+                    if attempt == self.max_retries - 1:
+                        raise
+                    self.retry_count += 1
+                    delay = min(60, 2 ** attempt) + random.random()
+                    print(f"LLM 呼叫失敗，{delay:.1f} 秒後重試 ({attempt + 1}/{self.max_retries})。錯誤: {e}")
+                    await asyncio.sleep(delay)
+
+        self.llm_call_count += 1
+        usage = response.usage_metadata or {}
+        self.input_tokens += usage.get("input_tokens", self.count_tokens(prompt))
+        self.output_tokens += usage.get("output_tokens", self.count_tokens(response.content))
+        return response.content
+
+    async def reduce(self, summaries):
+        combined = "\n\n".join(summaries)
+        if len(summaries) == 1 or self.count_tokens(combined) <= self.max_input_tokens:
+            return await self.call_llm(REDUCE_PROMPT.format(content=combined))
+
+        # 摘要合併後仍然過長，分組後再合併一次
+        groups = []
+        group = []
+        group_tokens = 0
+        for summary in summaries:
+            summary_tokens = self.count_tokens(summary)
+            if group and group_tokens + summary_tokens > self.max_input_tokens:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(summary)
+            group_tokens += summary_tokens
+        groups.append(group)
+
+        if len(groups) == len(summaries):
+            # 每份摘要都超過上限，無法再分組，截斷後合併
+            combined = self.encoding.decode(self.encoding.encode(combined)[:self.max_input_tokens])
+            return await self.call_llm(REDUCE_PROMPT.format(content=combined))
+
+        group_summaries = await asyncio.gather(*[self.call_llm(REDUCE_PROMPT.format(content="\n\n".join(group))) for group in groups])
+        return await self.reduce(list(group_summaries))
+
+    async def summarize(self, content):
+        """
+        Summarizes the content of one page. Raises SummarizationError on failure.
+        """
+        cleaned_content = "\n".join([line for line in content.split("\n") if line.strip()])
+
+        try:
+            if self.count_tokens(cleaned_content) <= self.max_input_tokens:
+                summary = await self.call_llm(SUMMARY_PROMPT.format(content=cleaned_content))
+            else:
+                chunks = self.split_tokens(cleaned_content)
+                chunk_summaries = await asyncio.gather(*[self.call_llm(SUMMARY_PROMPT.format(content=chunk)) for chunk in chunks])
+                summary = await self.reduce(list(chunk_summaries))
+        except Exception as e:
+            raise SummarizationError(str(e)) from e
+
+        self.page_count += 1
+        return summary
+
+    def stats(self):
+        minutes = max((time.perf_counter() - self.start_time) / 60, 1e-9)
+        return {
+            "pages": self.page_count,
+            "llm_calls": self.llm_call_count,
+            "retries": self.retry_count,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "pages_per_min": round(self.page_count / minutes, 2),
+            "tokens_per_min": round((self.input_tokens + self.output_tokens) / minutes, 1),
+        }
@@ -1,39 +1,192 @@
 import os
+import sys
 import json
+import time
+import asyncio
+import hashlib
+import chromadb
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if root_dir not in sys.path:
+    sys.path.append(root_dir)
+
+from utils.keyword_index import KeywordIndex
+from utils.numpy_vector_index import NumpyVectorIndex
+
 load_dotenv()
 api_key = os.getenv("API_KEY")
 os.environ["OPENAI_API_KEY"] = api_key
 
-# 準備數據
-data = []
-with open("office_websites_summary_02_23_25.json", "r", encoding='utf-8') as file:
-    data = json.load(file)
-
-# 將數據轉換為 Document 格式
-documents = [
-    Document(
-        page_content="網站標題: " + item["title"] + "\n簡介: " + item["summary"] + "\n---",
-        metadata={"link": item["link"]}
-    )
-    for item in data
-]
-
-# 使用 LangChain 的文本分割工具
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-split_documents = text_splitter.split_documents(documents)
-
-# 構建向量資料庫
-vectorstore = Chroma.from_documents(
-    documents = split_documents, 
-    embedding = OpenAIEmbeddings(),
-    collection_name = "ncu_office_websites",
-    persist_directory = "./ncu_office_websites"
-)
-
-print("vector store 構建完成！")
\ No newline at end of file
+JSON_FILE = "office_websites_summary_02_23_25.json"
+PERSIST_DIRECTORY = "./ncu_office_websites"
+COLLECTION_NAME = "ncu_office_websites"
+NUMPY_INDEX_DTYPE = "float16" # float16 | int8，None 表示不匯出 numpy 向量索引
+
+class IncrementalIndexer():
+    """
+    Incremental builder of the website vector store.
+    Each document is hashed by title + summary, and only new or changed documents are re-embedded.
+    The manifest records the hash and chunk ids of every indexed link.
+    After each run the collection is also exported as a NumpyVectorIndex for the numpy retriever backend.
+    """
+    def __init__(self, persist_directory, collection_name, batch_size=100, max_concurrency=4, max_retries=5, numpy_index_dtype="float16"):
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.manifest_path = os.path.join(persist_directory, "index_manifest.json")
+        self.keyword_index_path = os.path.join(persist_directory, "keyword_index.json")
+        self.numpy_index_directory = os.path.join(persist_directory, "numpy_index")
+        self.numpy_index_dtype = numpy_index_dtype
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.embeddings = OpenAIEmbeddings()
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.client = chromadb.PersistentClient(path=persist_directory)
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    @staticmethod
+    def content_hash(item):
+        return hashlib.sha256((item["title"] + "\n" + item["summary"]).encode("utf-8")).hexdigest()
+
+    def chunk_document(self, item):
+        """
+        Splits one website summary into chunks with ids derived from its link.
+        """
+        document = Document(
+            page_content="網站標題: " + item["title"] + "\n簡介: " + item["summary"] + "\n---",
+            metadata={"link": item["link"], "title": item["title"]}
+        )
+        chunks = self.text_splitter.split_documents([document])
+        link_hash = hashlib.sha1(item["link"].encode("utf-8")).hexdigest()[:16]
+        chunk_ids = [f"{link_hash}-{i}" for i in range(len(chunks))]
+        return chunk_ids, chunks
+
+    async def embed_batch(self, texts, semaphore):
+        async with semaphore:
+            for attempt in range(self.max_retries):
+                try:
+                    return await self.embeddings.aembed_documents(texts)
+                except Exception as e:
+                    if attempt == self.max_retries - 1:
+                        raise
+                    delay = 2 ** attempt
+                    print(f"Embedding 批次失敗，{delay} 秒後重試 ({attempt + 1}/{self.max_retries})。錯誤: {e}")
+                    await asyncio.sleep(delay)
+
+    async def upsert_chunks(self, collection, chunk_ids, chunks):
+        """
+        Embeds the chunks in batches with bounded concurrency and upserts them into the collection.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def process_batch(start):
+            batch_ids = chunk_ids[start:start + self.batch_size]
+            batch_chunks = chunks[start:start + self.batch_size]
+            vectors = await self.embed_batch([chunk.page_content for chunk in batch_chunks], semaphore)
+            collection.upsert(
+                ids=batch_ids,
+                embeddings=vectors,
+                documents=[chunk.page_content for chunk in batch_chunks],
+                metadatas=[chunk.metadata for chunk in batch_chunks],
+            )
+            print(f"已寫入 {start + len(batch_ids)} / {len(chunk_ids)} 個 chunk")
+
+        await asyncio.gather(*[process_batch(start) for start in range(0, len(chunk_ids), self.batch_size)])
+
+    def export_numpy_index(self, collection):
+        """
+        Exports the embeddings already stored in the collection, so no chunk is embedded again.
+        """
+        records = collection.get(include=["embeddings", "documents", "metadatas"])
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(records["documents"], records["metadatas"])]
+        NumpyVectorIndex.build(records["embeddings"], documents, self.numpy_index_directory, self.numpy_index_dtype)
+        print(f"已匯出 numpy 向量索引 ({self.numpy_index_dtype})，共 {len(documents)} 個 chunk")
+
+    async def run(self, items):
+        start_time = time.perf_counter()
+
+        # 以連結去除重複資料，保留最後一筆
+        items_by_link = {item["link"]: item for item in items}
+
+        manifest = self.load_manifest()
+        if manifest is None:
+            # 舊的資料庫沒有 manifest，chunk id 無法對應，只能重建一次
+            print("找不到 manifest，重新建立向量資料庫")
+            try:
+                self.client.delete_collection(self.collection_name)
+            except Exception:
+                pass
+            manifest = {"collection_name": self.collection_name, "documents": {}}
+        indexed_documents = manifest["documents"]
+
+        collection = self.client.get_or_create_collection(self.collection_name, embedding_function=None)
+
+        removed_links = [link for link in indexed_documents if link not in items_by_link]
+        stale_chunk_ids = []
+        upsert_chunk_ids = []
+        upsert_chunks = []
+        all_chunks = []
+        new_documents = {}
+        changed_count = 0
+
+        for link, item in items_by_link.items():
+            content_hash = self.content_hash(item)
+            chunk_ids, chunks = self.chunk_document(item)
+            all_chunks.extend(chunks)
+            new_documents[link] = {"hash": content_hash, "chunk_ids": chunk_ids}
+
+            previous = indexed_documents.get(link)
+            if previous is not None and previous["hash"] == content_hash:
+                continue
+
+            changed_count += 1
+            upsert_chunk_ids.extend(chunk_ids)
+            upsert_chunks.extend(chunks)
+            if previous is not None:
+                stale_chunk_ids.extend(chunk_id for chunk_id in previous["chunk_ids"] if chunk_id not in chunk_ids)
+
+        for link in removed_links:
+            stale_chunk_ids.extend(indexed_documents[link]["chunk_ids"])
+
+        print(f"共 {len(items_by_link)} 個網頁：新增或修改 {changed_count} 個，刪除 {len(removed_links)} 個")
+
+        if stale_chunk_ids:
+            collection.delete(ids=stale_chunk_ids)
+        if upsert_chunk_ids:
+            await self.upsert_chunks(collection, upsert_chunk_ids, upsert_chunks)
+
+        # 關鍵字索引為本地計算，直接以全部 chunk 重建
+        KeywordIndex().build(all_chunks).save(self.keyword_index_path)
+
+        if self.numpy_index_dtype is not None:
+            self.export_numpy_index(collection)
+
+        manifest["documents"] = new_documents
+        self.save_manifest(manifest)
+
+        print(f"索引更新完成，耗時 {time.perf_counter() - start_time:.1f} 秒")
+
+if __name__ == "__main__":
+    with open(JSON_FILE, "r", encoding='utf-8') as file:
+        data = json.load(file)
+
+    indexer = IncrementalIndexer(PERSIST_DIRECTORY, COLLECTION_NAME, numpy_index_dtype=NUMPY_INDEX_DTYPE)
+    asyncio.run(indexer.run(data))
+
+    print("vector store 構建完成！")
@@ -0,0 +1,551 @@
+import json
+import time
+import socket
+import atexit
+import threading
+import urllib.request
+from collections import deque
+
+import docker
+import urllib3
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+
+from utils.session_registry import SessionRegistry
+from utils.shared_instance import SharedInstance
+
+SESSION_LOST_MESSAGES = ("session not found", "session deleted", "no active session", "without establishing a connection", "connection refused")
+
+def is_session_lost_error(e):
+    """
+    Whether the exception means the WebDriver session or its container is gone, rather than a failed action.
+    """
+    if isinstance(e, (InvalidSessionIdException, urllib3.exceptions.HTTPError, ConnectionError)):
+        return True
+    return isinstance(e, WebDriverException) and any(message in str(e).lower() for message in SESSION_LOST_MESSAGES)
+
+class PooledBrowser():
+    """
+    A selenium/standalone-firefox container and the WebDriver session opened on it.
+    """
+    def __init__(self, container, port):
+        self.container = container
+        self.port = port
+        self.browser = None
+        self.user_id = None
+        self.created_at = time.time()
+        self.lease_count = 0
+        # 使用者操作與心跳檢查共用此鎖，避免同時對同一個 session 下指令
+        self.lock = threading.RLock()
+        self.alive = True
+        # 借用中的 session 被重建為空白頁時設為 True，頁面、登入與表單狀態都已遺失
+        self.session_reset = False
+        # 為了等待中的使用者而回收、正在重置的瀏覽器
+        self.reclaiming = False
+
+class BrowserPool(SharedInstance):
+    """
+    Process-wide pool of pre-started Firefox containers with open WebDriver sessions.
+    A background thread keeps `size` idle browsers ready and health-checks them, so leasing a
+    browser does not wait for a container to start.
+    Returned browsers get a new WebDriver session on the same container before they are leased
+    again, which discards cookies, storage and history of every site the previous user visited.
+    Only the containers labelled by this pool are ever removed.
+    The pool also supervises the sessions: containers are used as soon as the hub reports ready,
+    leased sessions are heartbeated, and dead sessions are reconnected, or their containers replaced,
+    by heal().
+    At most max_size browsers exist at once. Leases beyond that wait in FIFO order for a returned
+    browser, and under that pressure the least recently used session idle for evict_min_idle seconds
+    is reclaimed for the first waiter, one session at a time; any session idle for idle_timeout seconds is reclaimed by the background thread.
+    """
+    CONTAINER_LABEL = "cpilot.browser_pool"
+
+    def __init__(self, size=2, max_size=10, image="selenium/standalone-firefox", port_range_start=10001, port_range_end=10100,
+                 health_check_interval=30, heartbeat_interval=10, startup_timeout=60, status_poll_interval=0.2, status_poll_max_interval=2,
+                 lease_timeout=120, idle_timeout=1800, evict_min_idle=300):
+        self.size = size
+        self.max_size = max_size
+        self.image = image
+        self.port_range = range(port_range_start, port_range_end + 1)
+        self.health_check_interval = health_check_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.startup_timeout = startup_timeout
+        self.status_poll_interval = status_poll_interval
+        self.status_poll_max_interval = status_poll_max_interval
+        self.lease_timeout = lease_timeout
+        self.idle_timeout = idle_timeout
+        self.evict_min_idle = evict_min_idle
+
+        try:
+            self.client = docker.from_env()
+        except docker.errors.DockerException as e:
+            print(f"Error initializing Docker client: {e}")
+            self.client = None
+
+        self._lock = threading.Lock()
+        self._capacity_changed = threading.Condition(self._lock)
+        self._wake_up = threading.Event()
+        self._stopped = threading.Event()
+        self._idle = deque()
+        self._waiting = deque()
+        self._starting = 0
+        self._reclaiming = 0
+        self._free_ports = deque(self.port_range)
+        self._used_ports = set()
+        self._replenish_thread = None
+        self.registry = SessionRegistry()
+
+        self.created_count = 0
+        self.destroyed_count = 0
+        self.lease_count = 0
+        self.lease_wait_count = 0
+        self._startup_latencies = deque(maxlen=100)
+        self.startup_failure_count = 0
+        self.heartbeat_failure_count = 0
+        self.reconnect_count = 0
+        self.replace_count = 0
+        self.evicted_count = 0
+
+    def start(self):
+        """
+        Removes the containers left by a previous process, then starts the background replenishment
+        thread, which pre-starts the idle browsers.
+        """
+        with self._lock:
+            if self._replenish_thread is not None:
+                return
+            self._replenish_thread = threading.Thread(target=self.replenish_loop, daemon=True)
+        self.remove_stale_containers()
+        self._replenish_thread.start()
+        atexit.register(self.shutdown)
+
+    def remove_stale_containers(self):
+        """
+        Removes the containers labelled by this pool that are left over from a crashed or killed process.
+        """
+        if self.client is None:
+            return
+        try:
+            containers = self.client.containers.list(all=True, filters={"label": self.CONTAINER_LABEL})
+        except Exception as e:
+            print(f"Error listing stale containers: {e}")
+            return
+        for container in containers:
+            try:
+                container.remove(force=True)
+                print(f"Stale container {container.name} has been removed.")
+            except Exception as e:
+                print(f"Error removing stale container {container.name}: {e}")
+
+    def is_port_bound(self, port):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind(("0.0.0.0", port))
+                return False
+            except OSError:
+                return True
+
+    def allocate_port(self):
+        with self._lock:
+            # 仍被其他程式 (例如未清除的容器) 佔用的埠號移到最後，之後再試
+            for _ in range(len(self._free_ports)):
+                port = self._free_ports.popleft()
+                if self.is_port_bound(port):
+                    self._free_ports.append(port)
+                    continue
+                self._used_ports.add(port)
+                return port
+            raise Exception(f"No available ports in the range {self.port_range.start}-{self.port_range.stop - 1}.")
+
+    def release_port(self, port):
+        with self._lock:
+            if port in self._used_ports:
+                self._used_ports.remove(port)
+                self._free_ports.append(port)
+
+    def create_container(self):
+        """
+        Runs a new Firefox container on a free port.
+        """
+        port = self.allocate_port()
+        try:
+            container = self.client.containers.run(
+                self.image,
+                ports={'4444/tcp': port},
+                labels={self.CONTAINER_LABEL: "1"},
+                detach=True
+            )
+        except Exception:
+            self.release_port(port)
+            raise
+        print(f"Container {container.name} created on port {port}")
+        return PooledBrowser(container, port)
+
+    def is_hub_ready(self, port, timeout=2):
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/wd/hub/status", timeout=timeout) as response:
+                return bool(json.load(response).get("value", {}).get("ready"))
+        except Exception:
+            return False
+
+    def wait_until_ready(self, pooled):
+        """
+        Polls the hub /status of the container with exponential backoff until it reports ready.
+        """
+        deadline = time.monotonic() + self.startup_timeout
+        interval = self.status_poll_interval
+        while not self.is_hub_ready(pooled.port):
+            if time.monotonic() + interval > deadline:
+                raise TimeoutError(f"Selenium hub on port {pooled.port} was not ready within {self.startup_timeout} seconds")
+            time.sleep(interval)
+            interval = min(interval * 1.5, self.status_poll_max_interval)
+
+    def open_session(self, pooled):
+        """
+        Opens a new WebDriver session on the container of the pooled browser.
+        """
+        pooled.browser = webdriver.Remote(
+            command_executor=f'http://localhost:{pooled.port}/wd/hub',
+            options=webdriver.FirefoxOptions()
+        )
+        pooled.browser.get("about:blank")
+
+    def start_browser(self, pooled):
+        """
+        Waits for the container of the pooled browser to be ready and opens its session.
+        """
+        start_time = time.perf_counter()
+        try:
+            self.wait_until_ready(pooled)
+            self.open_session(pooled)
+        except Exception:
+            self.startup_failure_count += 1
+            raise
+        pooled.alive = True
+        self._startup_latencies.append(time.perf_counter() - start_time)
+        print(f"Browser on port {pooled.port} ready in {time.perf_counter() - start_time:.2f}s")
+
+    def create_browser(self):
+        pooled = self.create_container()
+        try:
+            self.start_browser(pooled)
+        except Exception:
+            self.destroy(pooled)
+            raise
+        self.created_count += 1
+        return pooled
+
+    def is_healthy(self, pooled):
+        try:
+            return pooled.browser is not None and pooled.browser.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def remove_container(self, pooled):
+        try:
+            pooled.container.stop()
+            pooled.container.remove()
+            print(f"Container {pooled.container.name} on port {pooled.port} has been stopped and removed.")
+        except Exception as e:
+            print(f"Error removing container {pooled.container.name}: {e}")
+        self.release_port(pooled.port)
+
+    def heal(self, pooled):
+        """
+        Restores a dead session of a leased browser in place: reconnects when the container is still
+        ready, otherwise replaces the container. The caller should hold pooled.lock.
+        """
+        if pooled.alive and self.is_healthy(pooled):
+            return
+        print(f"Session of user_id {pooled.user_id} on port {pooled.port} is dead, healing it...")
+        try:
+            if pooled.browser is not None:
+                pooled.browser.quit()
+        except Exception:
+            pass
+        pooled.browser = None
+
+        if self.is_hub_ready(pooled.port):
+            self.start_browser(pooled)
+            self.reconnect_count += 1
+            pooled.session_reset = True
+            print(f"Reconnected session of user_id {pooled.user_id} on port {pooled.port}")
+            return
+
+        self.remove_container(pooled)
+        old_container_id = pooled.container.id
+        replacement = self.create_container()
+        pooled.container, pooled.port = replacement.container, replacement.port
+        self.registry.rebind_container(pooled.user_id, old_container_id, pooled.container.id)
+        try:
+            self.start_browser(pooled)
+        except Exception:
+            pooled.alive = False
+            raise
+        self.replace_count += 1
+        pooled.session_reset = True
+        print(f"Replaced container of user_id {pooled.user_id}, now on port {pooled.port}")
+
+    def heartbeat(self):
+        """
+        Checks the sessions of the leased browsers that are not running an action and heals dead ones.
+        """
+        for _, pooled in self.registry.sessions():
+            if not pooled.lock.acquire(blocking=False):
+                continue # 正在執行操作的 session 視為存活
+            try:
+                if pooled.alive and self.is_healthy(pooled):
+                    continue
+                pooled.alive = False
+                self.heartbeat_failure_count += 1
+                self.heal(pooled)
+            except Exception as e:
+                print(f"Failed to heal session of user_id {pooled.user_id}: {e}")
+            finally:
+                pooled.lock.release()
+
+    def destroy(self, pooled):
+        """
+        Quits the WebDriver session and removes the container of the pooled browser.
+        """
+        try:
+            if pooled.browser is not None:
+                pooled.browser.quit()
+        except Exception:
+            pass
+        self.remove_container(pooled)
+        self.destroyed_count += 1
+        with self._capacity_changed:
+            self._capacity_changed.notify_all()
+
+    def total_browsers(self):
+        return len(self._idle) + len(self.registry) + self._starting
+
+    def admit(self, user_id):
+        """
+        Waits in FIFO order until an idle browser or a free slot is available.
+        Returns an idle browser, or None when the caller may start a new one (its slot is reserved).
+        """
+        ticket = object()
+        deadline = time.monotonic() + self.lease_timeout
+        with self._capacity_changed:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._waiting[0] is ticket:
+                        if self._idle:
+                            return self._idle.popleft()
+                        if self.total_browsers() < self.max_size:
+                            self._starting += 1
+                            return None
+
+                        # *已達上限時一次只回收一個最久未使用且閒置夠久的 session，重置後交給排在最前面的使用者
+                        # *回收中的瀏覽器尚未重置完成前不再回收其他 session；回收失敗 (例如正在執行操作) 時等待後再試
+                        if self._reclaiming == 0:
+                            candidate = self.registry.least_recently_used(self.evict_min_idle)
+                            if candidate is not None:
+                                self._capacity_changed.release()
+                                try:
+                                    self.evict(*candidate, reason="to admit a waiting user", reclaim=True)
+                                finally:
+                                    self._capacity_changed.acquire()
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser became available for user_id {user_id} within {self.lease_timeout} seconds")
+                    self._capacity_changed.wait(min(remaining, 1))
+            finally:
+                self._waiting.remove(ticket)
+                self._capacity_changed.notify_all()
+
+    def evict(self, user_id, pooled, reason, reclaim=False):
+        """
+        Reclaims the session of the user unless it is running an action.
+        With reclaim, the browser is kept after its reset for the user waiting at the head of the queue.
+        """
+        if not pooled.lock.acquire(blocking=False):
+            return False
+        try:
+            if self.registry.get(user_id) is not pooled:
+                return False
+            print(f"Evicting browser of user_id {user_id} {reason}")
+            self.evicted_count += 1
+            return self.release(pooled, reclaim)
+        finally:
+            pooled.lock.release()
+
+    def evict_idle_sessions(self):
+        for user_id, pooled in self.registry.idle_sessions(self.idle_timeout):
+            self.evict(user_id, pooled, reason=f"after {self.idle_timeout} seconds idle")
+
+    def lease(self, user_id):
+        """
+        Leases a ready browser to the user, starting one on demand when no idle browser is ready.
+        Raises TimeoutError when the pool stays full for lease_timeout seconds.
+        """
+        pooled = self.registry.get(user_id)
+        if pooled is not None:
+            return pooled
+
+        while True:
+            pooled = self.admit(user_id)
+            if pooled is None:
+                self.lease_wait_count += 1
+                print(f"No idle browser is ready, starting one for user_id {user_id}...")
+                try:
+                    pooled = self.create_browser()
+                finally:
+                    with self._capacity_changed:
+                        self._starting -= 1
+                        self._capacity_changed.notify_all()
+                break
+            if self.is_healthy(pooled):
+                break
+            print(f"Idle browser on port {pooled.port} is not responding, replacing it")
+            self.destroy(pooled)
+
+        pooled.user_id = user_id
+        pooled.lease_count += 1
+        pooled.session_reset = False
+        self.registry.register(user_id, pooled)
+        self.lease_count += 1
+        self._wake_up.set() # 補充被借出的閒置瀏覽器
+        print(f"Browser on port {pooled.port} leased to user_id {user_id}")
+        return pooled
+
+    def release(self, pooled, reclaim=False):
+        """
+        Returns a leased browser. Its session is replaced in the background before it is leased again.
+        Returns False when the browser was already returned.
+        """
+        # 借出與重置中的瀏覽器在同一把鎖內交接，總數不會短暫低於實際數量
+        with self._lock:
+            if pooled.user_id is None or self.registry.get(pooled.user_id) is not pooled:
+                return False # 已被回收
+            self.registry.unregister(pooled.user_id)
+            self._starting += 1
+            if reclaim:
+                pooled.reclaiming = True
+                self._reclaiming += 1
+        print(f"Browser on port {pooled.port} returned by user_id {pooled.user_id}")
+        pooled.user_id = None
+        threading.Thread(target=self.recycle, args=(pooled,), daemon=True).start()
+        return True
+
+    def recycle(self, pooled):
+        """
+        Resets a returned browser to a fresh session on about:blank and puts it back in the pool,
+        or removes it when the pool is already full and nobody is waiting for a browser.
+        The caller has reserved a starting slot for it.
+        """
+        try:
+            with self._lock:
+                keep = not self._stopped.is_set() and (len(self._idle) + self._starting - 1 < self.size or self._waiting or pooled.reclaiming)
+            if not keep:
+                self.destroy(pooled)
+                return
+            try:
+                try:
+                    pooled.browser.quit()
+                except Exception:
+                    pass
+                pooled.browser = None
+                self.start_browser(pooled)
+            except Exception as e:
+                print(f"Failed to reset browser on port {pooled.port}: {e}")
+                self.destroy(pooled)
+                return
+            with self._lock:
+                self._idle.append(pooled)
+        finally:
+            with self._capacity_changed:
+                self._starting -= 1
+                if pooled.reclaiming:
+                    pooled.reclaiming = False
+                    self._reclaiming -= 1
+                self._capacity_changed.notify_all()
+
+    def health_check(self):
+        """
+        Removes idle browsers whose session no longer responds.
+        """
+        with self._lock:
+            idle = list(self._idle)
+        for pooled in idle:
+            if not self.is_healthy(pooled):
+                with self._lock:
+                    if pooled not in self._idle:
+                        continue
+                    self._idle.remove(pooled)
+                print(f"Idle browser on port {pooled.port} failed the health check, replacing it")
+                self.destroy(pooled)
+
+    def replenish(self):
+        """
+        Starts browsers until `size` browsers are idle or starting, within max_size browsers in total.
+        """
+        while not self._stopped.is_set():
+            with self._lock:
+                if len(self._idle) + self._starting >= self.size or self.total_browsers() >= self.max_size:
+                    return
+                self._starting += 1
+            try:
+                pooled = self.create_browser()
+            except Exception as e:
+                print(f"Failed to start a pooled browser: {e}")
+                return
+            finally:
+                with self._lock:
+                    self._starting -= 1
+            with self._capacity_changed:
+                self._idle.append(pooled)
+                self._capacity_changed.notify_all()
+
+    def replenish_loop(self):
+        last_health_check = 0.0
+        while not self._stopped.is_set():
+            if time.monotonic() - last_health_check >= self.health_check_interval:
+                self.health_check()
+                last_health_check = time.monotonic()
+            self.heartbeat()
+            self.evict_idle_sessions()
+            self.replenish()
+            self._wake_up.wait(self.heartbeat_interval)
+            self._wake_up.clear()
+
+    def shutdown(self):
+        """
+        Stops the replenishment and removes every browser of the pool.
+        """
+        self._stopped.set()
+        self._wake_up.set()
+        with self._lock:
+            browsers = list(self._idle)
+            self._idle.clear()
+        for user_id, pooled in self.registry.sessions():
+            self.registry.unregister(user_id)
+            browsers.append(pooled)
+        for pooled in browsers:
+            self.destroy(pooled)
+
+    def stats(self):
+        latencies = sorted(self._startup_latencies)
+        with self._lock:
+            return {
+                "idle": len(self._idle),
+                "leased": len(self.registry),
+                "waiting": len(self._waiting),
+                "starting": self._starting,
+                "reclaiming": self._reclaiming,
+                "created": self.created_count,
+                "destroyed": self.destroyed_count,
+                "leases": self.lease_count,
+                "lease_waits": self.lease_wait_count,
+                "startup_avg_s": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "startup_p95_s": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else None,
+                "startup_failures": self.startup_failure_count,
+                "heartbeat_failures": self.heartbeat_failure_count,
+                "reconnects": self.reconnect_count,
+                "replacements": self.replace_count,
+                "evicted": self.evicted_count,
+            }
@@ -0,0 +1,186 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+class EmbeddingCache():
+    """
+    Two-tier cache of query embeddings: an in-memory LRU in front of a SQLite store.
+    Entries are keyed by normalized text plus embedding model name.
+    """
+    def __init__(self, db_path, max_memory_entries=1024, max_disk_entries=100000, ttl_seconds=30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, created_at REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize("NFKC", text)
+        return re.sub(r"\s+", " ", text).strip().lower()
+
+    @staticmethod
+    def make_key(text, model):
+        normalized = EmbeddingCache.normalize(text)
+        return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def is_expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, text, model):
+        """
+        Returns the cached embedding of the text, or None on a miss.
+        """
+        key = self.make_key(text, model)
+        now = time.time()
+
+        with self._lock:
+            record = self._memory.get(key)
+            if record is not None:
+                vector, created_at = record
+                if not self.is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return vector
+                del self._memory[key]
+
+            row = self._conn.execute("SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            blob, created_at = row
+            if self.is_expired(created_at, now):
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._conn.commit()
+                self._disk_count -= 1
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE embeddings SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            vector = array("f", blob).tolist()
+            self._put_memory(key, vector, created_at)
+            self.disk_hits += 1
+            return vector
+
+    def put(self, text, model, vector):
+        key = self.make_key(text, model)
+        now = time.time()
+        blob = array("f", vector).tobytes()
+
+        with self._lock:
+            self._put_memory(key, list(vector), now)
+            exists = self._conn.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, blob, now, now)
+            )
+            self._conn.commit()
+            if not exists:
+                self._disk_count += 1
+            self._evict_disk()
+
+    def _put_memory(self, key, vector, created_at):
+        self._memory[key] = (vector, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        # 超過容量時刪除最久未使用的項目，一次多刪 10% 以減少頻繁清理
+        if self._disk_count <= self.max_disk_entries:
+            return
+        excess = self._disk_count - self.max_disk_entries + self.max_disk_entries // 10
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._disk_count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.evictions += excess
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "disk_entries": self._disk_count,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else None,
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks up the EmbeddingCache before calling the embedding API.
+    """
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", None) or type(embeddings).__name__
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text, self.model)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, self.model, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text, self.model)
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            self.cache.put(text, self.model, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self.cache.get(text, self.model) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                self.cache.put(texts[i], self.model, vector)
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self.cache.get(text, self.model) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            new_vectors = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, new_vectors):
+                self.cache.put(texts[i], self.model, vector)
+                vectors[i] = vector
+        return vectors
@@ -0,0 +1,145 @@
+import re
+
+import lxml.html
+import lxml.etree
+import charset_normalizer
+
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-]+)""", re.IGNORECASE)
+# 不含網頁內文的元素，一律移除；<form> 本身常包住整個頁面 (ASP.NET)，只移除其中的表單控制項
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "button", "select", "input", "textarea"]
+BOILERPLATE_TAGS = ["nav", "footer", "header", "aside"]
+BOILERPLATE_ATTRIBUTE_RE = re.compile(r"(^|[\s_\-])(nav|navbar|menu|footer|breadcrumbs?|sidebar|sitemap|share|social|cookie|skip)([\s_\-]|$)", re.IGNORECASE)
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol", "dl", "dt", "dd", "br", "pre", "blockquote"}
+
+def detect_charset(body, header_charset=None, sample_size=16384):
+    """
+    Takes the charset from the Content-Type header or the <meta> tag, and only falls back to
+    charset detection on a small sample of the body.
+    """
+    if header_charset:
+        return header_charset
+
+    match = META_CHARSET_RE.search(body[:4096])
+    if match:
+        return match.group(1).decode("ascii")
+
+    sample = body[:sample_size]
+    try:
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 取樣可能剛好切在多位元組字元中間
+        if e.start >= len(sample) - 3:
+            return "utf-8"
+
+    best = charset_normalizer.from_bytes(sample).best()
+    return best.encoding if best is not None else "utf-8"
+
+def decode_html(body, header_charset=None):
+    charset = detect_charset(body, header_charset)
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+def is_link_dense(element, min_links=5, max_ratio=0.8):
+    """
+    Whether the element is a menu-like block whose text is mostly link text.
+    """
+    links = element.findall(".//a")
+    if len(links) < min_links:
+        return False
+    text_length = len(element.text_content().strip())
+    if text_length == 0:
+        return True
+    link_text_length = sum(len(link.text_content().strip()) for link in links)
+    return link_text_length / text_length > max_ratio
+
+def remove_boilerplate(root, max_drop_ratio=0.5):
+    """
+    Removes scripts, form controls and boilerplate blocks (navigation, footers, menus).
+    A boilerplate block holding more than max_drop_ratio of the page text is kept, since it wraps the content.
+    Link-dense lists are treated as menus only outside <main> / <article>; link tables are kept as content (e.g. download lists).
+    """
+    for element in list(root.iter(*NON_CONTENT_TAGS)):
+        element.drop_tree()
+
+    total_length = len(root.text_content().strip())
+
+    def holds_most_text(element):
+        return total_length > 0 and len(element.text_content().strip()) > total_length * max_drop_ratio
+
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str) or element.getparent() is None:
+            continue
+        if element.tag in BOILERPLATE_TAGS:
+            is_boilerplate = True
+        elif element.tag in ("body", "main", "article"):
+            is_boilerplate = False
+        else:
+            attributes = " ".join([element.get("id", ""), element.get("class", ""), element.get("role", "")])
+            is_boilerplate = bool(BOILERPLATE_ATTRIBUTE_RE.search(attributes)) or (
+                element.tag in ("ul", "ol", "div") and is_link_dense(element) and next(element.iterancestors("main", "article"), None) is None
+            )
+        if is_boilerplate and not holds_most_text(element):
+            element.drop_tree()
+
+def element_to_lines(element):
+    """
+    Collects the text of the element, breaking lines at block elements.
+    """
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str):
+            if node.tail:
+                parts.append(node.tail)
+            return
+        is_block = node.tag in BLOCK_TAGS
+        if is_block:
+            parts.append("\n")
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+        if is_block:
+            parts.append("\n")
+        if node.tail:
+            parts.append(node.tail)
+
+    walk(element)
+    lines = []
+    for line in "".join(parts).split("\n"):
+        line = re.sub(r"\s+", " ", line).strip()
+        if line and (not lines or lines[-1] != line):
+            lines.append(line)
+    return lines
+
+def extract_main_text(html, max_chars=20000):
+    """
+    Parses the HTML with lxml, strips boilerplate (scripts, navigation, footers, menus) and returns
+    the main text, truncated to max_chars at a line boundary (0 keeps the whole text).
+    """
+    if not html.strip():
+        return ""
+    try:
+        root = lxml.html.fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        return ""
+
+    remove_boilerplate(root)
+
+    # 有 <main> 或 <article> 時只取主要內容
+    main_elements = root.xpath("//main | //article")
+    candidates = [element for element in main_elements if len(element.text_content().strip()) > 200]
+    lines = []
+    for element in candidates or [root]:
+        lines.extend(element_to_lines(element))
+
+    return truncate_text("\n".join(lines), max_chars)
+
+def truncate_text(text, max_chars):
+    if max_chars and len(text) > max_chars:
+        cut = text.rfind("\n", 0, max_chars)
+        text = text[:cut if cut > 0 else max_chars] + f"\n[Content truncated at {max_chars} characters]"
+    return text
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import threading
+import uuid
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from utils.url_canonicalizer import UrlCanonicalizer
+from utils.shared_instance import SharedInstance
+
+class ResponseTooLargeError(Exception):
+    pass
+
+class HttpCache(SharedInstance):
+    """
+    Disk-backed HTTP response cache for the Search tools, keyed by canonical url.
+    Each entry is a folder holding the body, its metadata and the texts extracted from it.
+    Freshness follows Cache-Control / Expires, stale entries are revalidated with ETag / Last-Modified,
+    and the total size is bounded by LRU eviction.
+    Writes and removals of one entry are serialized by a per-key lock, and bodies are replaced atomically,
+    so a reader holding the body path keeps reading the version it opened.
+    """
+    def __init__(self, cache_directory="cache/http", max_bytes=512 * 1024 * 1024, default_ttl=600, max_heuristic_ttl=86400):
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_heuristic_ttl = max_heuristic_ttl
+        self.canonicalizer = UrlCanonicalizer()
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        os.makedirs(cache_directory, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        """
+        Rebuilds the in-memory LRU index (size and last access of every entry) from the cache directory.
+        """
+        for key in os.listdir(self.cache_directory):
+            metadata_path = self.get_path(key, "meta.json")
+            if not os.path.exists(metadata_path):
+                continue
+            size = self.get_entry_size(key)
+            self._entries[key] = {"size": size, "last_access": os.path.getmtime(metadata_path)}
+            self.total_bytes += size
+
+    def get_key(self, url):
+        if not isinstance(url, str) or not url:
+            raise ValueError(f"Invalid url to cache: {url!r}")
+        canonical_url = self.canonicalizer.canonicalize(url) or url
+        return hashlib.sha256(canonical_url.encode("utf-8")).hexdigest()
+
+    def get_path(self, key, file_name):
+        return os.path.join(self.cache_directory, key, file_name)
+
+    def get_key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get_entry_size(self, key):
+        entry_directory = os.path.join(self.cache_directory, key)
+        return sum(os.path.getsize(os.path.join(entry_directory, name)) for name in os.listdir(entry_directory))
+
+    def get_expires_at(self, headers, now):
+        """
+        Computes the expiry time from Cache-Control, Expires or a Last-Modified heuristic.
+        """
+        cache_control = headers.get("Cache-Control", "").lower()
+        if "no-cache" in cache_control:
+            return now
+        max_age = re.search(r"(?:s-maxage|max-age)=(\d+)", cache_control)
+        if max_age:
+            return now + int(max_age.group(1))
+
+        try:
+            if headers.get("Expires"):
+                return parsedate_to_datetime(headers["Expires"]).timestamp()
+            if headers.get("Last-Modified"):
+                age = now - parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+                return now + min(self.max_heuristic_ttl, max(0, age * 0.1))
+        except (TypeError, ValueError):
+            pass
+        return now + self.default_ttl
+
+    def read_metadata(self, key):
+        try:
+            with open(self.get_path(key, "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def write_metadata(self, key, metadata):
+        temp_path = self.get_path(key, f"meta.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(temp_path, self.get_path(key, "meta.json"))
+
+    def refresh_metadata(self, key, metadata):
+        """
+        Rewrites the metadata of a revalidated entry. Returns False when the entry has been removed meanwhile.
+        """
+        with self.get_key_lock(key):
+            if not os.path.exists(self.get_path(key, "body")):
+                return False
+            self.write_metadata(key, metadata)
+            return True
+
+    def store(self, key, url, response_headers, content_type, charset, body, now, body_path=None):
+        """
+        Stores a new body (bytes, or a downloaded file at body_path) and its metadata.
+        """
+        entry_directory = os.path.join(self.cache_directory, key)
+        with self.get_key_lock(key):
+            os.makedirs(entry_directory, exist_ok=True)
+            # 內容改變，舊的抽取文字一併刪除；body 以 os.replace 原子替換，正在讀取舊 body 的請求不受影響
+            for name in os.listdir(entry_directory):
+                if name.endswith(".txt"):
+                    os.remove(os.path.join(entry_directory, name))
+            if body_path is None:
+                body_path = os.path.join(entry_directory, f"body.{uuid.uuid4().hex}.tmp")
+                with open(body_path, "wb") as f:
+                    f.write(body)
+            os.replace(body_path, self.get_path(key, "body"))
+            metadata = self.build_metadata(url, response_headers, content_type, charset, now)
+            self.write_metadata(key, metadata)
+        self.record_size(key)
+        return metadata
+
+    def build_metadata(self, url, response_headers, content_type, charset, now):
+        return {
+            "url": url,
+            "content_type": content_type,
+            "charset": charset,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "stored_at": now,
+            "expires_at": self.get_expires_at(response_headers, now),
+        }
+
+    def record_size(self, key):
+        try:
+            size = self.get_entry_size(key)
+        except OSError:
+            return # 已被其他請求刪除
+        with self._lock:
+            previous = self._entries.get(key)
+            self.total_bytes += size - (previous["size"] if previous else 0)
+            self._entries[key] = {"size": size, "last_access": time.time()}
+        self.evict()
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]["last_access"] = time.time()
+        try:
+            os.utime(self.get_path(key, "meta.json"))
+        except OSError:
+            pass
+
+    def remove(self, key):
+        with self.get_key_lock(key):
+            shutil.rmtree(os.path.join(self.cache_directory, key), ignore_errors=True)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry["size"]
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+        """
+        with self._lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            victims = sorted(self._entries, key=lambda key: self._entries[key]["last_access"])
+        for key in victims:
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.remove(key)
+
+    def read_body(self, key):
+        """
+        Returns the cached body, or None when the entry has been removed meanwhile.
+        """
+        try:
+            with open(self.get_path(key, "body"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    async def fetch(self, session: aiohttp.ClientSession, url):
+        """
+        Returns {"key", "status", "content_type", "charset", "body", "from_cache"} of the url.
+        Only successful (200) responses are cached.
+        """
+        key = self.get_key(url)
+        now = time.time()
+        metadata = await asyncio.to_thread(self.read_metadata, key)
+
+        if metadata is not None and now < metadata["expires_at"]:
+            body = await asyncio.to_thread(self.read_body, key)
+            if body is not None:
+                self.hits += 1
+                self.touch(key)
+                return {"key": key, "status": 200, "content_type": metadata["content_type"], "charset": metadata["charset"], "body": body, "from_cache": True}
+            metadata = None # 讀取前已被淘汰，視為未命中
+
+        headers = {}
+        if metadata is not None:
+            if metadata["etag"]:
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata["last_modified"]:
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        async with session.get(url, headers=headers) as response:
+            status = response.status
+            response_headers = response.headers
+            content_type = response.content_type
+            charset = response.charset
+            body = await response.read() if status == 200 else b""
+
+        if status == 304 and metadata is not None:
+            # *內容未改變，更新有效期限後沿用快取
+            self.revalidated += 1
+            metadata["expires_at"] = self.get_expires_at(response_headers, now)
+            body = await asyncio.to_thread(self.read_body, key)
+            if body is None or not await asyncio.to_thread(self.refresh_metadata, key, metadata):
+                # 驗證期間已被淘汰，重新下載完整內容
+                await asyncio.to_thread(self.remove, key)
+                return await self.fetch(session, url)
+            self.touch(key)
+            return {"key": key, "status": 200, "content_type": metadata["content_type"], "charset": metadata["charset"], "body": body, "from_cache": True}
+
+        self.misses += 1
+        if status == 200 and "no-store" not in response_headers.get("Cache-Control", "").lower():
+            await asyncio.to_thread(self.store, key, url, response_headers, content_type, charset, body, now)
+        return {"key": key, "status": status, "content_type": content_type, "charset": charset, "body": body, "from_cache": False}
+
+    async def fetch_file(self, session: aiohttp.ClientSession, url, max_bytes=None, timeout: aiohttp.ClientTimeout = None):
+        """
+        Like fetch, but streams the body to a file in the cache instead of holding it in memory.
+        Returns {"key", "status", "content_type", "path", "from_cache"}; raises ResponseTooLargeError over max_bytes.
+        timeout overrides the session timeout, since a large download can take longer than a page request.
+        """
+        key = self.get_key(url)
+        now = time.time()
+        metadata = await asyncio.to_thread(self.read_metadata, key)
+
+        if metadata is not None and now < metadata["expires_at"] and os.path.exists(self.get_path(key, "body")):
+            self.hits += 1
+            self.touch(key)
+            return {"key": key, "status": 200, "content_type": metadata["content_type"], "path": self.get_path(key, "body"), "from_cache": True}
+
+        headers = {}
+        if metadata is not None:
+            if metadata["etag"]:
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata["last_modified"]:
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        # 每次下載使用不同的暫存檔，同時下載同一個檔案不會互相覆寫
+        download_path = os.path.join(self.cache_directory, f"{key}.{uuid.uuid4().hex}.download")
+        async with session.get(url, headers=headers, timeout=timeout or session.timeout) as response:
+            status = response.status
+            response_headers = response.headers
+            content_type = response.content_type
+            charset = response.charset
+            if status == 200:
+                if max_bytes and response.content_length and response.content_length > max_bytes:
+                    raise ResponseTooLargeError(f"{response.content_length} bytes exceeds the limit of {max_bytes} bytes")
+                size = 0
+                try:
+                    with open(download_path, "wb") as f:
+                        async for chunk in response.content.iter_chunked(64 * 1024):
+                            size += len(chunk)
+                            if max_bytes and size > max_bytes:
+                                raise ResponseTooLargeError(f"download exceeds the limit of {max_bytes} bytes")
+                            f.write(chunk)
+                except BaseException:
+                    if os.path.exists(download_path):
+                        os.remove(download_path)
+                    raise
+
+        if status == 304 and metadata is not None:
+            metadata["expires_at"] = self.get_expires_at(response_headers, now)
+            if not await asyncio.to_thread(self.refresh_metadata, key, metadata):
+                await asyncio.to_thread(self.remove, key)
+                return await self.fetch_file(session, url, max_bytes, timeout)
+            self.revalidated += 1
+            self.touch(key)
+            return {"key": key, "status": 200, "content_type": metadata["content_type"], "path": self.get_path(key, "body"), "from_cache": True}
+
+        self.misses += 1
+        if status != 200:
+            return {"key": key, "status": status, "content_type": content_type, "path": None, "from_cache": False}
+
+        try:
+            await asyncio.to_thread(self.store, key, url, response_headers, content_type, charset, None, now, download_path)
+        except BaseException:
+            if os.path.exists(download_path):
+                os.remove(download_path)
+            raise
+        return {"key": key, "status": status, "content_type": content_type, "path": self.get_path(key, "body"), "from_cache": False}
+
+    def get_text(self, key, variant):
+        """
+        Returns the extracted text cached next to the body, or None.
+        """
+        try:
+            with open(self.get_path(key, f"{variant}.txt"), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_text(self, key, variant, text):
+        with self.get_key_lock(key):
+            if not os.path.exists(self.get_path(key, "meta.json")):
+                return
+            temp_path = self.get_path(key, f"{variant}.{uuid.uuid4().hex}.tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, self.get_path(key, f"{variant}.txt"))
+        self.record_size(key)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "total_bytes": self.total_bytes,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
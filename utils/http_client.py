@@ -0,0 +1,41 @@
+import asyncio
+import weakref
+
+import aiohttp
+
+class SharedHttpClient():
+    """
+    Shared aiohttp session (and connection pool) for the Search tools.
+    An aiohttp session is bound to the event loop it was created in, so one session is kept per running loop.
+    """
+    _sessions = weakref.WeakKeyDictionary()
+    max_connections = 100
+    max_connections_per_host = 10
+    timeout = 15
+
+    @classmethod
+    def configure(cls, max_connections=100, max_connections_per_host=10, timeout=15):
+        cls.max_connections = max_connections
+        cls.max_connections_per_host = max_connections_per_host
+        cls.timeout = timeout
+
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = cls._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=cls.max_connections,
+                limit_per_host=cls.max_connections_per_host,
+                ttl_dns_cache=300,
+                ssl=False,
+            )
+            session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=cls.timeout))
+            cls._sessions[loop] = session
+        return session
+
+    @classmethod
+    async def close(cls):
+        session = cls._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
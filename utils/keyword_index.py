@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import math
+import unicodedata
+from collections import Counter, defaultdict
+
+from langchain_core.documents import Document
+
+# 中日韓文字範圍，這些字元之間沒有空白分隔，以字元 bigram 切詞
+CJK_PATTERN = r"㐀-䶿一-鿿豈-﫿぀-ヿ가-힯"
+TOKEN_RE = re.compile(rf"[{CJK_PATTERN}]+|[a-z0-9]+")
+CJK_RE = re.compile(rf"[{CJK_PATTERN}]")
+
+def normalize_text(text):
+    return unicodedata.normalize("NFKC", text).lower()
+
+def tokenize(text):
+    """
+    Tokenizes text into character bigrams for CJK runs and words for latin/digit runs.
+    """
+    tokens = []
+    for run in TOKEN_RE.findall(normalize_text(text)):
+        if CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+def document_key(doc: Document):
+    """
+    Key used to identify the same chunk across the keyword and vector result lists.
+    """
+    return (doc.metadata.get("link"), doc.page_content)
+
+def reciprocal_rank_fusion(result_lists, k=10, rrf_k=60):
+    """
+    Fuses several ranked lists of Documents with reciprocal rank fusion.
+    """
+    scores = defaultdict(float)
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = document_key(doc)
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+
+    ranked_keys = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked_keys]
+
+class KeywordIndex():
+    """
+    In-memory BM25 inverted index over the website summary chunks.
+    """
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self.postings = {}
+        self.doc_lengths = []
+        self.avg_doc_length = 0.0
+
+    def build(self, documents):
+        """
+        Builds the index from a list of Documents.
+        """
+        postings = defaultdict(dict)
+        doc_lengths = []
+        for doc_id, doc in enumerate(documents):
+            term_counts = Counter(tokenize(doc.page_content))
+            doc_lengths.append(sum(term_counts.values()))
+            for term, count in term_counts.items():
+                postings[term][doc_id] = count
+
+        self.documents = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        self.postings = dict(postings)
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        return self
+
+    def search_with_scores(self, query, k=10):
+        """
+        Returns the top k (Document, BM25 score) pairs for the query.
+        """
+        doc_count = len(self.documents)
+        if doc_count == 0:
+            return []
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for doc_id, tf in term_postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        top_doc_ids = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [(self.get_document(doc_id), scores[doc_id]) for doc_id in top_doc_ids]
+
+    def search(self, query, k=10):
+        return [doc for doc, _ in self.search_with_scores(query, k)]
+
+    def get_document(self, doc_id):
+        record = self.documents[doc_id]
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def save(self, path):
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "documents": self.documents,
+            "postings": self.postings,
+            "doc_lengths": self.doc_lengths,
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.documents = data["documents"]
+        # JSON 的 key 只能是字串，載入時轉回整數的 doc id
+        index.postings = {term: {int(doc_id): tf for doc_id, tf in docs.items()} for term, docs in data["postings"].items()}
+        index.doc_lengths = data["doc_lengths"]
+        index.avg_doc_length = sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        return index
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+from utils.shared_instance import SharedInstance
+
+class LinkGraph(SharedInstance):
+    """
+    On-disk site link graph written by the crawler: canonical url -> titled outlinks and crawl time.
+    Outlinks are stored as zlib-compressed JSON [title, link] pairs, one row per page, so that
+    website_links_crawler can list the links of a crawled page without fetching it.
+    """
+    def __init__(self, db_path, max_age=86400):
+        self.db_path = db_path
+        self.max_age = max_age
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS pages (link TEXT PRIMARY KEY, crawled_at REAL, outlinks BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def encode_outlinks(outlinks):
+        pairs = [[website["title"], website["link"]] for website in outlinks]
+        return zlib.compress(json.dumps(pairs, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    @staticmethod
+    def decode_outlinks(blob):
+        return [{"title": title, "link": link} for title, link in json.loads(zlib.decompress(blob))]
+
+    def put(self, link, outlinks, crawled_at=None):
+        """
+        Records the outlinks ({"title", "link"}) of the canonical link.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (link, crawled_at, outlinks) VALUES (?, ?, ?)",
+                (link, crawled_at or time.time(), self.encode_outlinks(outlinks))
+            )
+            self._conn.commit()
+
+    def touch(self, link):
+        """
+        Marks the outlinks of the link as still current (e.g. the page was not modified).
+        """
+        with self._lock:
+            self._conn.execute("UPDATE pages SET crawled_at = ? WHERE link = ?", (time.time(), link))
+            self._conn.commit()
+
+    def get(self, link):
+        """
+        Returns {"links", "crawled_at"} of the link, or None if the page is unknown or older than max_age.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT crawled_at, outlinks FROM pages WHERE link = ?", (link,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        crawled_at, blob = row
+        if self.max_age is not None and time.time() - crawled_at > self.max_age:
+            self.stale += 1
+            return None
+
+        self.hits += 1
+        return {"links": self.decode_outlinks(blob), "crawled_at": crawled_at}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def stats(self):
+        return {"pages": len(self), "hits": self.hits, "stale": self.stale, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,86 @@
+import time
+import asyncio
+from urllib.parse import urlparse
+
+import aiohttp
+
+class LinkProber():
+    """
+    Validates links through one shared aiohttp session.
+    Each link is probed with HEAD first and falls back to a one-byte ranged GET when HEAD is not supported.
+    Requests to the same host are bounded by a semaphore, and probe_all returns whatever has been
+    validated when the overall deadline is reached.
+    With a LinkStatusCache, links with a fresh cached result are not probed again.
+    """
+    HEAD_FALLBACK_STATUS = {400, 403, 405, 406, 500, 501}
+
+    def __init__(self, session: aiohttp.ClientSession, cache=None, per_host_concurrency=8, request_timeout=3, deadline=10):
+        self.session = session
+        self.cache = cache
+        self.per_host_concurrency = per_host_concurrency
+        self.request_timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self.deadline = deadline
+        self.host_semaphores = {}
+
+    def get_host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self.host_semaphores[host]
+
+    async def probe(self, url):
+        """
+        Returns the HTTP status code of the url, or raises on network errors.
+        """
+        async with self.get_host_semaphore(url):
+            async with self.session.head(url, allow_redirects=True, ssl=False, timeout=self.request_timeout) as response:
+                status = response.status
+            if status not in self.HEAD_FALLBACK_STATUS:
+                return status
+
+            # 部分伺服器不支援 HEAD，改用只取第一個位元組的 GET
+            headers = {"Range": "bytes=0-0"}
+            async with self.session.get(url, headers=headers, allow_redirects=True, ssl=False, timeout=self.request_timeout) as response:
+                return 200 if response.status == 206 else response.status
+
+    async def probe_website(self, website):
+        if self.cache is not None:
+            entry = self.cache.get(website["link"])
+            if entry is not None:
+                return website if entry["status"] == 200 else None
+
+        try:
+            status = await self.probe(website["link"])
+        except Exception as e:
+            if self.cache is not None:
+                self.cache.put(website["link"], None, website["title"])
+            print(f"[{website['title']}]: [{website['link']}]測試回應失敗，不加入爬取清單，錯誤: {e}")
+            return None
+
+        if self.cache is not None:
+            self.cache.put(website["link"], status, website["title"])
+        if status != 200:
+            print(f"[{website['title']}]: [{website['link']}]測試回應失敗，不加入爬取清單，HTTP 狀態碼: {status}")
+            return None
+        return website
+
+    async def probe_all(self, websites):
+        """
+        Probes all websites ({"title", "link"}) and returns the valid ones in their original order.
+        Links not validated before the deadline are dropped.
+        """
+        if not websites:
+            return []
+
+        start_time = time.monotonic()
+        tasks = [asyncio.create_task(self.probe_website(website)) for website in websites]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            print(f"連結測試超過時限 {self.deadline} 秒，略過 {len(pending)} 個尚未完成的連結")
+
+        valid_websites = [task.result() for task in tasks if task in done and task.result() is not None]
+        print(f"連結測試完成：{len(valid_websites)} / {len(websites)} 個有效，耗時 {time.monotonic() - start_time:.2f} 秒")
+        return valid_websites
@@ -0,0 +1,60 @@
+import time
+import threading
+from collections import OrderedDict
+
+from utils.shared_instance import SharedInstance
+
+class LinkStatusCache(SharedInstance):
+    """
+    Process-wide cache of link validation results keyed by canonical url.
+    Valid links (status 200) are kept for positive_ttl seconds and failed links for negative_ttl seconds.
+    """
+    def __init__(self, positive_ttl=6 * 3600, negative_ttl=600, max_entries=50000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """
+        Returns the cached {"status", "title", "checked_at"} of the url, or None if missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            ttl = self.positive_ttl if entry["status"] == 200 else self.negative_ttl
+            if time.time() - entry["checked_at"] > ttl:
+                del self._entries[url]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(url)
+            self.hits += 1
+            return entry
+
+    def put(self, url, status, title):
+        """
+        Records the probe result of the url. status is None when the request failed.
+        """
+        with self._lock:
+            self._entries[url] = {"status": status, "title": title, "checked_at": time.time()}
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
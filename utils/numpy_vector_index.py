@@ -0,0 +1,123 @@
+import os
+import json
+
+import numpy as np
+from langchain_core.documents import Document
+
+class NumpyVectorIndex():
+    """
+    In-process brute-force vector index for small corpora.
+    The L2-normalized embeddings are stored as a float16 or int8 (per-row scaled) matrix that is
+    memory-mapped on load, and the chunk texts and metadata are kept in a JSON side table.
+    Top-k is answered by cosine similarity with blocked matmul and argpartition.
+    """
+    VECTORS_FILE = "vectors.npy"
+    SCALES_FILE = "scales.npy"
+    METADATA_FILE = "metadata.json"
+
+    def __init__(self, vectors, scales, documents, block_size=4096):
+        self.vectors = vectors
+        self.scales = scales
+        self.documents = documents
+        self.block_size = block_size
+
+    @staticmethod
+    def quantize(matrix, dtype):
+        """
+        Normalizes the rows and converts them to dtype. Returns (vectors, scales); scales is None for float16.
+        """
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.maximum(norms, 1e-12)
+        if dtype == "float16":
+            return matrix.astype(np.float16), None
+        if dtype == "int8":
+            scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+            vectors = np.round(matrix / scales[:, None]).astype(np.int8)
+            return vectors, scales.astype(np.float32)
+        raise ValueError(f"Unsupported dtype: {dtype}")
+
+    @classmethod
+    def build(cls, embeddings, documents, directory, dtype="float16"):
+        """
+        Writes the index of the embeddings and their Documents to the directory.
+        The metadata file is written last, so readers only see complete indexes.
+        """
+        os.makedirs(directory, exist_ok=True)
+        vectors, scales = cls.quantize(embeddings, dtype)
+
+        def save_array(file_name, array):
+            temp_path = os.path.join(directory, file_name + ".tmp")
+            with open(temp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(temp_path, os.path.join(directory, file_name))
+
+        save_array(cls.VECTORS_FILE, vectors)
+        if scales is not None:
+            save_array(cls.SCALES_FILE, scales)
+
+        metadata = {
+            "dtype": dtype,
+            "count": len(documents),
+            "dimension": int(vectors.shape[1]) if len(documents) else 0,
+            "documents": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents],
+        }
+        temp_path = os.path.join(directory, cls.METADATA_FILE + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(temp_path, os.path.join(directory, cls.METADATA_FILE))
+
+    @classmethod
+    def load(cls, directory, block_size=4096):
+        with open(os.path.join(directory, cls.METADATA_FILE), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        vectors = np.load(os.path.join(directory, cls.VECTORS_FILE), mmap_mode="r")
+        scales = np.load(os.path.join(directory, cls.SCALES_FILE)) if metadata["dtype"] == "int8" else None
+        if vectors.shape[0] != metadata["count"]:
+            raise ValueError(f"Numpy vector index at {directory} is incomplete: {vectors.shape[0]} vectors for {metadata['count']} documents")
+        return cls(vectors, scales, metadata["documents"], block_size)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def scores(self, query_vector):
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / max(float(np.linalg.norm(query_vector)), 1e-12)
+
+        # 分塊轉成 float32 再做矩陣乘法，使用 BLAS 且不需一次展開整個矩陣
+        scores = np.empty(len(self.documents), dtype=np.float32)
+        for start in range(0, len(self.documents), self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query_vector
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search_by_vector_with_scores(self, query_vector, k=10):
+        if not self.documents:
+            return []
+        scores = self.scores(query_vector)
+        k = min(k, len(scores))
+        top_ids = np.argpartition(-scores, k - 1)[:k]
+        top_ids = top_ids[np.argsort(-scores[top_ids])]
+        return [(self.get_document(doc_id), float(scores[doc_id])) for doc_id in top_ids]
+
+    def get_document(self, doc_id):
+        record = self.documents[int(doc_id)]
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+class NumpyVectorStore():
+    """
+    Wraps a NumpyVectorIndex with the query embedding function, exposing the similarity_search
+    interface the retriever engine uses on Chroma.
+    """
+    def __init__(self, embedding_function, directory, block_size=4096):
+        self.embedding_function = embedding_function
+        self.index = NumpyVectorIndex.load(directory, block_size)
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.index.search_by_vector_with_scores(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
@@ -0,0 +1,101 @@
+import time
+
+from utils.browser_pool import is_session_lost_error
+
+# 第一次執行時注入追蹤器：MutationObserver 記錄 DOM 最後新增或移除節點的時間，並包裝 XMLHttpRequest 與 fetch 計算未完成的請求
+# 只觀察節點增減，屬性、樣式與文字變動 (動畫、輪播、跑馬燈) 不算頁面仍在載入
+# 追蹤器留在目前的文件中，之後的操作觸發的請求也會被記錄；換頁後會重新注入
+PAGE_STATE_SCRIPT = """
+if (!window.__pageWaitState) {
+    const state = window.__pageWaitState = {pending: 0, lastActivity: performance.now(), unloading: false};
+    const touch = () => { state.lastActivity = performance.now(); };
+    new MutationObserver(touch).observe(document, {subtree: true, childList: true});
+
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (...args) {
+        state.pending++;
+        touch();
+        this.addEventListener("loadend", () => { state.pending--; touch(); }, {once: true});
+        return send.apply(this, args);
+    };
+
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function (...args) {
+            state.pending++;
+            touch();
+            return fetch.apply(this, args).finally(() => { state.pending--; touch(); });
+        };
+    }
+
+    window.addEventListener("beforeunload", () => { state.unloading = true; });
+}
+const state = window.__pageWaitState;
+return {
+    readyState: document.readyState,
+    pending: state.pending,
+    quietFor: (performance.now() - state.lastActivity) / 1000,
+    unloading: state.unloading,
+};
+"""
+
+class PageWaiter():
+    """
+    Waits for the page of a browser to settle after an action: the document is loaded, no XHR or fetch
+    request is pending and no nodes have been added or removed for quiet_period seconds.
+    Once the page is loaded with no pending request, DOM quiet is waited for at most max_dom_wait seconds,
+    so pages that keep changing their DOM proceed quickly; timeout bounds the whole wait (e.g. long polling).
+    """
+    def __init__(self, timeout=10, quiet_period=0.3, max_dom_wait=1.0, poll_interval=0.05, ready_states=("complete",)):
+        self.timeout = timeout
+        self.quiet_period = quiet_period
+        self.max_dom_wait = max_dom_wait
+        self.poll_interval = poll_interval
+        self.ready_states = tuple(ready_states)
+
+        self.wait_count = 0
+        self.timeout_count = 0
+        self.total_wait_time = 0.0
+
+    def is_loaded(self, state):
+        return state["readyState"] in self.ready_states and state["pending"] <= 0 and not state["unloading"]
+
+    def wait(self, browser):
+        """
+        Polls the page state until it settles or the timeout passes. Returns whether the page settled.
+        """
+        start_time = time.perf_counter()
+        deadline = start_time + self.timeout
+        state = None
+        settled = False
+        loaded_since = None
+        while True:
+            try:
+                state = browser.execute_script(PAGE_STATE_SCRIPT)
+                if state is not None and self.is_loaded(state):
+                    loaded_since = loaded_since or time.perf_counter()
+                    settled = state["quietFor"] >= self.quiet_period or time.perf_counter() - loaded_since >= self.max_dom_wait
+                else:
+                    loaded_since = None
+            except Exception as e:
+                # 換頁途中執行腳本可能失敗，稍後再試
+                if is_session_lost_error(e):
+                    raise
+            if settled or time.perf_counter() + self.poll_interval > deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        elapsed = time.perf_counter() - start_time
+        self.wait_count += 1
+        self.total_wait_time += elapsed
+        if not settled:
+            self.timeout_count += 1
+            print(f"Page did not settle within {self.timeout} seconds, last state: {state}")
+        return settled
+
+    def stats(self):
+        return {
+            "waits": self.wait_count,
+            "timeouts": self.timeout_count,
+            "avg_wait_s": round(self.total_wait_time / self.wait_count, 3) if self.wait_count else None,
+        }
@@ -0,0 +1,51 @@
+from langchain_core.documents import Document
+
+from utils.keyword_index import KeywordIndex
+
+def split_passages(text, chunk_size=800, overlap=100, metadata=None):
+    """
+    Splits text into passages of about chunk_size characters at line boundaries.
+    Each passage is a Document whose metadata holds its character offsets ("start", "end") in the text.
+    """
+    passages = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        if end < len(text):
+            cut = text.rfind("\n", start + chunk_size // 2, end)
+            if cut > 0:
+                end = cut
+        passage_text = text[start:end].strip()
+        if passage_text:
+            passages.append(Document(page_content=passage_text, metadata={**(metadata or {}), "start": start, "end": end}))
+        if end >= len(text):
+            break
+        # 與前一段重疊，避免答案剛好被切在段落邊界
+        next_start = max(start + 1, end - overlap)
+        line_start = text.find("\n", next_start, end)
+        start = line_start + 1 if line_start >= 0 else next_start
+    return passages
+
+class PassageSelector():
+    """
+    Ranks the passages of one page against a query with BM25 so that the reader tools only return
+    the relevant part of a long page.
+    """
+    def __init__(self, chunk_size=800, overlap=100, top_k=3):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.top_k = top_k
+
+    def split(self, text, metadata=None):
+        return split_passages(text, self.chunk_size, self.overlap, metadata)
+
+    def select(self, passages, query, cursor=0):
+        """
+        Returns (top_k ranked passages from cursor, number of ranked passages, whether any passage matched).
+        When no passage matches the query, the passages are returned in document order.
+        """
+        ranked = [doc for doc, score in KeywordIndex().build(passages).search_with_scores(query, k=len(passages)) if score > 0]
+        matched = bool(ranked)
+        if not matched:
+            ranked = passages
+        return ranked[cursor:cursor + self.top_k], len(ranked), matched
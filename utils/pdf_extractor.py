@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+from utils.shared_instance import SharedInstance
+
+def _extract_page_texts(pdf_path, page_numbers):
+    """
+    Extracts the text of the given 1-based pages. Runs in a worker process.
+    """
+    page_texts = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            page_texts[page_number] = pdf.pages[page_number - 1].extract_text() or ""
+    return page_texts
+
+def count_pages(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+def parse_page_range(pages, page_count, max_pages):
+    """
+    Parses a page selection such as "3", "1-5" or "1,3,8-10" into sorted 1-based page numbers.
+    An empty selection means the first max_pages pages.
+    """
+    if not pages or not pages.strip():
+        return list(range(1, min(page_count, max_pages) + 1))
+
+    page_numbers = set()
+    for part in pages.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            start = int(start) if start else 1
+            end = int(end) if end else page_count
+            page_numbers.update(range(max(1, start), min(page_count, end) + 1))
+        else:
+            page_number = int(part)
+            if 1 <= page_number <= page_count:
+                page_numbers.add(page_number)
+    return sorted(page_numbers)[:max_pages]
+
+class PdfExtractor(SharedInstance):
+    """
+    Extracts PDF pages in parallel in a shared process pool.
+    Small selections are extracted in a thread to avoid the process start-up overhead.
+    """
+    def __init__(self, max_workers=4, max_pages=10, max_query_pages=50, max_bytes=50 * 1024 * 1024, parallel_threshold=4,
+                 download_timeout=120, download_read_timeout=30):
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.max_query_pages = max_query_pages
+        self.max_bytes = max_bytes
+        self.download_timeout = download_timeout
+        self.download_read_timeout = download_read_timeout
+        self.parallel_threshold = parallel_threshold
+        self._pool = None
+
+    def get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    async def extract(self, pdf_path, page_numbers):
+        """
+        Returns {page_number: text} of the given pages.
+        """
+        if len(page_numbers) <= self.parallel_threshold:
+            return await asyncio.to_thread(_extract_page_texts, pdf_path, page_numbers)
+
+        # 依 worker 數量平均分配頁面，每個 worker 只開啟一次 PDF
+        worker_count = min(self.max_workers, len(page_numbers))
+        batches = [page_numbers[i::worker_count] for i in range(worker_count)]
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self.get_pool(), _extract_page_texts, pdf_path, batch) for batch in batches
+        ])
+
+        page_texts = {}
+        for result in results:
+            page_texts.update(result)
+        return page_texts
@@ -0,0 +1,231 @@
+import os
+import time
+import threading
+from collections import deque
+
+from langchain_openai import OpenAIEmbeddings
+
+from utils.embedding_cache import EmbeddingCache, CachedEmbeddings
+from utils.keyword_index import KeywordIndex, normalize_text, reciprocal_rank_fusion
+from utils.numpy_vector_index import NumpyVectorStore
+from utils.shared_instance import SharedInstance
+
+class WebsiteRetrieverEngine(SharedInstance):
+    """
+    Process-wide retrieval engine for the website information database.
+    The vector store and the embedding client are opened once and shared by every session.
+    Vector backends: "chroma" (the persisted Chroma collection) and "numpy" (the in-process
+    brute-force index exported next to it by vector_store.py).
+    Search modes: "vector", "keyword" (BM25, no embedding call) and "hybrid" (reciprocal rank fusion of both).
+    """
+    def __init__(self, persist_directory, collection_name="ncu_office_websites", k=10, reload_check_interval=30, warm_up_query=None, embedding_cache=None, search_mode="hybrid", keyword_fast_path=True, keyword_index_path=None, vector_backend="chroma", numpy_index_directory=None):
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.k = k
+        self.reload_check_interval = reload_check_interval
+        self.warm_up_query = warm_up_query
+        self.search_mode = search_mode
+        self.keyword_fast_path = keyword_fast_path
+        self.keyword_index_path = keyword_index_path or os.path.join(persist_directory, "keyword_index.json")
+        self.vector_backend = vector_backend
+        self.numpy_index_directory = numpy_index_directory or os.path.join(persist_directory, "numpy_index")
+
+        # 查詢向量快取，重複的查詢不需再呼叫 embedding API
+        self.embedding_cache = EmbeddingCache(**embedding_cache) if embedding_cache else None
+        self.embeddings = OpenAIEmbeddings()
+        if self.embedding_cache is not None:
+            self.embeddings = CachedEmbeddings(self.embeddings, self.embedding_cache)
+
+        self.vectorstore = None
+        self.keyword_index = None
+        self.index_version = None
+        self.last_reload_check = 0.0
+
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.query_count = 0
+        self.error_count = 0
+        self.fast_path_count = 0
+        self.load_count = 0
+        self.last_load_time = None
+        self.last_load_seconds = None
+
+    def get_index_version(self):
+        """
+        Returns the latest modification time of the files in the persist directory.
+        """
+        latest = 0.0
+        if not os.path.isdir(self.persist_directory):
+            return latest
+        for root, _, files in os.walk(self.persist_directory):
+            for file_name in files:
+                try:
+                    latest = max(latest, os.path.getmtime(os.path.join(root, file_name)))
+                except OSError:
+                    continue
+        return latest
+
+    def load(self):
+        """
+        Opens the persisted collection and swaps it in for the current one.
+        """
+        with self._load_lock:
+            start_time = time.perf_counter()
+            index_version = self.get_index_version()
+
+            if self.vector_backend == "numpy":
+                vectorstore = NumpyVectorStore(self.embeddings, self.numpy_index_directory)
+            else:
+                # 只有使用 Chroma 時才載入 chromadb，numpy 後端不需負擔其啟動時間與記憶體
+                from langchain_chroma import Chroma
+
+                # chromadb 會以路徑快取 client，重新載入前需清除才能讀到新的索引
+                if self.vectorstore is not None:
+                    from chromadb.api.client import SharedSystemClient
+                    SharedSystemClient.clear_system_cache()
+
+                vectorstore = Chroma(
+                    embedding_function=self.embeddings,
+                    collection_name=self.collection_name,
+                    persist_directory=self.persist_directory
+                )
+
+            keyword_index = None
+            if os.path.exists(self.keyword_index_path):
+                keyword_index = KeywordIndex.load(self.keyword_index_path)
+            else:
+                print(f"Keyword index not found at {self.keyword_index_path}, falling back to vector search only.")
+
+            self.vectorstore = vectorstore
+            self.keyword_index = keyword_index
+            self.index_version = index_version
+            self.last_reload_check = time.monotonic()
+            self.load_count += 1
+            self.last_load_time = time.time()
+            self.last_load_seconds = time.perf_counter() - start_time
+            print(f"Website retriever index loaded in {self.last_load_seconds:.2f}s (load #{self.load_count})")
+
+        return vectorstore
+
+    def warm_up(self):
+        """
+        Loads the index ahead of the first query and optionally runs a warm-up query.
+        """
+        if self.vectorstore is None:
+            self.load()
+        if self.warm_up_query:
+            try:
+                self.search(self.warm_up_query)
+            except Exception as e:
+                print(f"Website retriever warm-up query failed: {e}")
+        return self.health()
+
+    def reload_if_changed(self):
+        """
+        Reloads the index when the files in the persist directory have changed.
+        """
+        now = time.monotonic()
+        if now - self.last_reload_check < self.reload_check_interval:
+            return False
+        self.last_reload_check = now
+
+        if self.get_index_version() != self.index_version:
+            print("Website retriever index changed on disk, reloading...")
+            self.load()
+            return True
+        return False
+
+    def get_vectorstore(self):
+        if self.vectorstore is None:
+            self.load()
+        else:
+            self.reload_if_changed()
+        return self.vectorstore
+
+    def search(self, query, k=None, mode=None):
+        """
+        Searches the website information database and records the latency.
+        """
+        k = k or self.k
+        mode = mode or self.search_mode
+        vectorstore = self.get_vectorstore()
+        keyword_index = self.keyword_index
+        if keyword_index is None:
+            mode = "vector"
+
+        start_time = time.perf_counter()
+        try:
+            if mode == "vector":
+                docs = vectorstore.similarity_search(query, k=k)
+            elif mode == "keyword":
+                docs = keyword_index.search(query, k=k)
+            else:
+                keyword_docs = keyword_index.search(query, k=k * 2)
+                if self.keyword_fast_path and self.is_exact_title_match(query, keyword_docs):
+                    # *查詢與標題完全相符時直接回傳關鍵字結果，不需呼叫 embedding API
+                    with self._stats_lock:
+                        self.fast_path_count += 1
+                    docs = keyword_docs[:k]
+                else:
+                    vector_docs = vectorstore.similarity_search(query, k=k * 2)
+                    docs = reciprocal_rank_fusion([vector_docs, keyword_docs], k=k)
+        except Exception:
+            with self._stats_lock:
+                self.error_count += 1
+            raise
+        self.record_latency(time.perf_counter() - start_time)
+        return docs
+
+    @staticmethod
+    def is_exact_title_match(query, docs):
+        if not docs:
+            return False
+        title = docs[0].metadata.get("title")
+        if not title:
+            return False
+        # 只有整個查詢等於標題 (忽略大小寫、全半形與空白) 才算完全相符，部分相符仍需向量檢索
+        normalized_query = "".join(normalize_text(query).split())
+        normalized_title = "".join(normalize_text(title).split())
+        return len(normalized_query) >= 2 and normalized_query == normalized_title
+
+    def record_latency(self, seconds):
+        with self._stats_lock:
+            self.query_count += 1
+            self._latencies.append(seconds)
+
+    def health(self):
+        return {
+            "status": "ok" if self.vectorstore is not None else "not_loaded",
+            "collection_name": self.collection_name,
+            "vector_backend": self.vector_backend,
+            "search_mode": self.search_mode if self.keyword_index is not None else "vector",
+            "index_version": self.index_version,
+            "load_count": self.load_count,
+        }
+
+    def stats(self):
+        """
+        Returns query count, error count and latency percentiles (ms) of recent queries.
+        """
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            query_count = self.query_count
+            error_count = self.error_count
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+        return {
+            **self.health(),
+            "query_count": query_count,
+            "error_count": error_count,
+            "fast_path_count": self.fast_path_count,
+            "last_load_seconds": self.last_load_seconds,
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+        }
@@ -0,0 +1,126 @@
+import io
+import os
+import time
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from utils.shared_instance import SharedInstance
+
+MIME_TYPES = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+}
+
+FILE_EXTENSIONS = {
+    "WEBP": ".webp",
+    "JPEG": ".jpg",
+    "PNG": ".png",
+}
+
+class EncodedScreenshot():
+    def __init__(self, name, data, image_format, width, height):
+        self.name = name
+        self.data = data
+        self.image_format = image_format
+        self.width = width
+        self.height = height
+
+    @property
+    def mime_type(self):
+        return MIME_TYPES[self.image_format]
+
+    @property
+    def file_name(self):
+        return self.name + FILE_EXTENSIONS[self.image_format]
+
+    def to_data_uri(self):
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+class ScreenshotPipeline(SharedInstance):
+    """
+    Process-wide pipeline that turns raw PNG screenshots into small images for the chat.
+    Browser actions only grab the PNG bytes; downscaling, encoding (WebP / JPEG) and the optional
+    write to disk run on worker threads, and the caller gets a Future of the EncodedScreenshot.
+    """
+    def __init__(self, max_width=1280, image_format="WEBP", quality=70, max_workers=2, persist=True):
+        image_format = image_format.upper()
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported screenshot format {image_format}, expected one of {list(MIME_TYPES)}")
+        self.max_width = max_width
+        self.image_format = image_format
+        self.quality = quality
+        self.persist = persist
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot")
+
+        self._stats_lock = threading.Lock()
+        self.encoded_count = 0
+        self.failed_count = 0
+        self.total_encode_time = 0.0
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    def submit(self, png_bytes, name, folder_path=None):
+        """
+        Queues the PNG screenshot for encoding and returns a Future of its EncodedScreenshot.
+        When persist is enabled and folder_path is given, the encoded image is also written there.
+        """
+        return self.executor.submit(self.process, png_bytes, name, folder_path)
+
+    def process(self, png_bytes, name, folder_path):
+        start_time = time.perf_counter()
+        try:
+            screenshot = self.encode(png_bytes, name)
+        except Exception:
+            with self._stats_lock:
+                self.failed_count += 1
+            raise
+        with self._stats_lock:
+            self.encoded_count += 1
+            self.total_encode_time += time.perf_counter() - start_time
+            self.input_bytes += len(png_bytes)
+            self.output_bytes += len(screenshot.data)
+
+        # 寫入硬碟不影響聊天顯示，另外排入背景執行
+        if self.persist and folder_path:
+            self.executor.submit(self.save, screenshot, folder_path)
+        return screenshot
+
+    def encode(self, png_bytes, name):
+        with Image.open(io.BytesIO(png_bytes)) as image:
+            if image.width > self.max_width:
+                height = max(1, round(image.height * self.max_width / image.width))
+                image = image.resize((self.max_width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            elif self.image_format == "PNG":
+                # 不需縮放的 PNG 直接使用原始資料
+                return EncodedScreenshot(name, png_bytes, self.image_format, image.width, image.height)
+
+            if self.image_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+
+            buffer = io.BytesIO()
+            if self.image_format == "PNG":
+                image.save(buffer, format="PNG", optimize=False)
+            else:
+                image.save(buffer, format=self.image_format, quality=self.quality)
+            return EncodedScreenshot(name, buffer.getvalue(), self.image_format, image.width, image.height)
+
+    def save(self, screenshot, folder_path):
+        file_path = os.path.join(folder_path, screenshot.file_name)
+        try:
+            with open(file_path, "wb") as f:
+                f.write(screenshot.data)
+        except OSError as e:
+            print(f"Failed to save screenshot {file_path}: {e}")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "encoded": self.encoded_count,
+                "failed": self.failed_count,
+                "avg_encode_ms": round(self.total_encode_time / self.encoded_count * 1000, 1) if self.encoded_count else None,
+                "compression_ratio": round(self.output_bytes / self.input_bytes, 3) if self.input_bytes else None,
+            }
@@ -1,179 +1,159 @@
-import os
-import docker
-import random
-import time
-from selenium import webdriver
+from functools import wraps
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 
+from utils.browser_pool import BrowserPool, is_session_lost_error
+from utils.page_waiter import PageWaiter
+from utils.screenshot_pipeline import ScreenshotPipeline
+
+# 不依賴目前頁面狀態的操作，session 重建後仍可直接執行；navigate_with_url 會重新建立頁面狀態
+REPLAYABLE_ACTIONS = {"navigate_with_url", "wait_for_page_settled", "screen_shot"}
+
+def session_reset_message(user_id, action):
+    return (f"Browser session of user_id {user_id} was reset to a blank page, so the previous page, login and form state are lost. "
+            f"{action} was not performed. Navigate to the page again and redo the previous steps.")
+
+def supervised(func):
+    """
+    Runs a browser action while holding the user's session, so the heartbeat does not interleave with it.
+    A dead session is healed before the action (most actions swallow their own exceptions, so the session is
+    checked up front), and a session lost during the action is healed without replaying it.
+    A session evicted by the pool while idle is leased again on the user's next action.
+    A healed or re-leased session starts on a blank page, so until the user navigates again, actions that depend
+    on the page return an explicit reset message instead of running on the blank page.
+    """
+    @wraps(func)
+    def wrapper(self, user_id, *args, **kwargs):
+        replayable = func.__name__ in REPLAYABLE_ACTIONS
+        while True:
+            pooled = self.get_pooled_by_user_id(user_id)
+            if pooled is None:
+                if user_id not in self.user_ids:
+                    return func(self, user_id, *args, **kwargs)
+                print(f"Browser of user_id {user_id} was evicted, leasing a new one...")
+                pooled = self.browser_pool.lease(user_id)
+                pooled.session_reset = True
+
+            with pooled.lock:
+                # 取得鎖之前 session 可能已被回收，需重新借用
+                if pooled.user_id != user_id:
+                    continue
+                try:
+                    if not pooled.alive or not self.browser_pool.is_healthy(pooled):
+                        pooled.alive = False
+                        self.browser_pool.heal(pooled)
+                    if pooled.session_reset and not replayable:
+                        print(f"Session of user_id {user_id} was reset before {func.__name__}")
+                        return session_reset_message(user_id, func.__name__)
+                    try:
+                        result = func(self, user_id, *args, **kwargs)
+                    except Exception as e:
+                        if not is_session_lost_error(e):
+                            raise
+                        print(f"Session of user_id {user_id} was lost during {func.__name__}: {e}")
+                        pooled.alive = False
+                        self.browser_pool.heal(pooled)
+                        if not replayable:
+                            return session_reset_message(user_id, func.__name__)
+                        result = func(self, user_id, *args, **kwargs)
+                    if func.__name__ == "navigate_with_url":
+                        pooled.session_reset = False
+                    return result
+                finally:
+                    self.browser_pool.registry.touch(user_id)
+    return wrapper
+
 class SeleniumController:
-    def __init__(self):
-        try:
-            self.client = docker.from_env()
-        except docker.errors.DockerException as e:
-            print(f"Error initializing Docker client: {e}")
-            self.client = None
-        self.port_list = []
-        self.used_ports = set()
-        self.browser_list = []
+    def __init__(self, browser_pool: BrowserPool = None, page_waiter: PageWaiter = None, screenshot_pipeline: ScreenshotPipeline = None):
+        # *瀏覽器由共用的 BrowserPool 預先啟動，使用者借用後歸還，不再每次建立容器
+        self.browser_pool = browser_pool or BrowserPool.get_instance()
+        self.page_waiter = page_waiter or PageWaiter()
+        # *截圖只在此取得 PNG 資料，縮圖、壓縮與存檔交給背景執行緒
+        self.screenshot_pipeline = screenshot_pipeline or ScreenshotPipeline.get_instance()
+        # *session 由 BrowserPool 的 registry 管理，這裡只記錄此 controller 借用的 user_id
+        self.user_ids = set()
         self.screenshot_folder_path = ""
 
-    # ! selenium contoller 的解構子無法使用，Import Error
-    # def __del__(self):
-    #     """
-    #     Destructor to ensure all containers are stopped and removed.
-    #     """
-    #     try:
-    #         print("Cleaning up all containers...")
-    #         containers = self.client.containers.list()
-    #         print(f"Found {len(containers)} containers.")
-    #         for container in containers:
-    #             if "selenium/standalone-firefox:latest" in container.image.tags:
-    #                 container.stop()
-    #                 container.remove()
-    #                 print(f"Container {container.name} has been stopped and removed.")
-    #         self.port_list.clear()
-    #         self.used_ports.clear()
-    #     # except ImportError:
-    #     #     # 捕獲無法 import 的情況（Python 關閉中）
-    #     #     # 此處不輸出訊息，因為 Python 關閉中輸出可能不會顯示
-    #     #     pass
-    #     except Exception as e:
-    #         print(f"Error during cleanup: {e}")
-
     def clean_containers(self):
         """
-        Cleans up all containers and resets the port list.
+        Returns all browsers leased by this controller to the browser pool.
         """
         try:
-            print("Cleaning up all containers...")
-            containers = self.client.containers.list()
-            print(f"Found {len(containers)} containers.")
-            for container in containers:
-                if "selenium/standalone-firefox:latest" in container.image.tags:
-                    container.stop()
-                    container.remove()
-                    print(f"Container {container.name} has been stopped and removed.")
-            self.port_list.clear()
-            self.used_ports.clear()
+            print("Returning all browsers to the pool...")
+            print("Page wait stats: ", self.page_waiter.stats())
+            print("Screenshot stats: ", self.screenshot_pipeline.stats())
+            for user_id in list(self.user_ids):
+                self.remove_browser(user_id)
         except Exception as e:
             print(f"Error during cleanup: {e}")
 
-    def create_container(self, user_id):
-        """
-        Creates a container for the given user_id using selenium/standalone-firefox image.
-        The port will be assigned from the range 10001 to 10100.
-        """
-        print(f"Creating container for user_id {user_id}...")
-        # Find an available port
-        available_ports = [port for port in range(10001, 10101) if port not in self.used_ports]
-        if not available_ports:
-            raise Exception("No available ports in the range 10001-10100.")
-        
-        port = random.choice(available_ports)
-        self.used_ports.add(port)
-
-        # Create the container
-        container = self.client.containers.run(
-            "selenium/standalone-firefox",
-            ports={'4444/tcp': port},
-            detach=True
-        )
-        print(f"Container {container.name} created on port {port}")
-        # Store the user_id and port mapping
-        self.port_list.append({"user_id": user_id, "port": port})
-        print(f"Container created for user_id {user_id} on port {port}")
-        return container
-
     def get_port_by_user_id(self, user_id):
         """
         Retrieves the port number assigned to the given user_id.
         """
-        for record in self.port_list:
-            if record["user_id"] == user_id:
-                return record["port"]
-        return None
-
-    def stop_and_remove_container(self, user_id):
-        """
-        Stops and removes the container associated with the given user_id.
-        """
-        port = self.get_port_by_user_id(user_id)
-        if port is None:
-            print(f"No container found for user_id {user_id}")
-            return
-
-        # Find and stop the container using the port
-        containers = self.client.containers.list()
-        for container in containers:
-            if container.attrs['NetworkSettings']['Ports']['4444/tcp'][0]['HostPort'] == str(port):
-                container.stop()
-                container.remove()
-                self.used_ports.remove(port)
-                self.port_list = [record for record in self.port_list if record["user_id"] != user_id]
-                print(f"Container for user_id {user_id} on port {port} has been stopped and removed.")
-                return
-
-        print(f"No running container found for user_id {user_id}")
-
-    def connect_to_container(self, user_id):
-        """
-        Connects to the Selenium container for the given user_id using Selenium WebDriver.
-        """
-        port = self.get_port_by_user_id(user_id)
-        if port is None:
-            raise Exception(f"No container found for user_id {user_id}")
-
-        # Connect to the Selenium container
-        browser = webdriver.Remote(
-            command_executor=f'http://localhost:{port}/wd/hub',
-            options=webdriver.FirefoxOptions()
-        )
-        print(f"Connected to Selenium container for user_id {user_id} on port {port}")
-        return browser
+        pooled = self.get_pooled_by_user_id(user_id)
+        return pooled.port if pooled is not None else None
     
     def create_browser(self, user_id):
         """
-        Creates a browser instance for the given user_id.
+        Leases a browser instance from the browser pool for the given user_id.
         """
-        self.create_container(user_id)
-        # wait for the container to start
-        time.sleep(5)
-        browser = self.connect_to_container(user_id)
-        self.browser_list.append({"user_id": user_id, "browser": browser})
-        # return browser
+        self.browser_pool.lease(user_id)
+        self.user_ids.add(user_id)
+        print("Browser pool stats: ", self.browser_pool.stats())
         return f"Browser created for user_id {user_id}"
     
     def remove_browser(self, user_id):
         """
-        Removes the browser instance associated with the given user_id.
+        Returns the browser instance associated with the given user_id to the browser pool.
         """
-        self.stop_and_remove_container(user_id)
-        self.browser_list = [record for record in self.browser_list if record["user_id"] != user_id]
+        self.user_ids.discard(user_id)
+        pooled = self.get_pooled_by_user_id(user_id)
+        if pooled is not None:
+            with pooled.lock:
+                if pooled.user_id == user_id:
+                    self.browser_pool.release(pooled)
         print(f"Browser for user_id {user_id} has been removed.")
     
+    def get_pooled_by_user_id(self, user_id):
+        """
+        Retrieves the pooled browser leased to the given user_id.
+        """
+        return self.browser_pool.registry.get(user_id)
+
     def get_browser_by_user_id(self, user_id):
         """
         Retrieves the browser instance associated with the given user_id.
         """
-        for record in self.browser_list:
-            if record["user_id"] == user_id:
-                return record["browser"]
-        return None
+        pooled = self.get_pooled_by_user_id(user_id)
+        return pooled.browser if pooled is not None else None
+
+    @supervised
+    def wait_for_page_settled(self, user_id):
+        """
+        Waits until the page of the given user_id is loaded, has no pending requests and its DOM is quiet.
+        """
+        browser = self.get_browser_by_user_id(user_id)
+        if browser is None:
+            raise Exception(f"No browser found for user_id {user_id}")
 
+        return self.page_waiter.wait(browser)
+
+    @supervised
     def screen_shot(self, user_id, file_name):
         """
-        Takes a screenshot of the browser window for the given user_id and saves it to the specified file path.
+        Takes a screenshot of the browser window for the given user_id.
+        Returns a Future of the EncodedScreenshot, which is also saved to the screenshot folder when persisting is enabled.
         """
         browser = self.get_browser_by_user_id(user_id)
         if browser is None:
             raise Exception(f"No browser found for user_id {user_id}")
-        
-        file_path = os.path.join(self.screenshot_folder_path, f"{file_name}.png")
-        browser.save_screenshot(file_path)
-        print(f"Screenshot saved for user_id {user_id} at {file_path}")
-        return f"Screenshot saved for user_id {user_id} at {file_path}"
 
+        png_bytes = browser.get_screenshot_as_png()
+        print(f"Screenshot {file_name} taken for user_id {user_id}")
+        return self.screenshot_pipeline.submit(png_bytes, file_name, self.screenshot_folder_path)
+
+    @supervised
     def scroll_to_middle(self, user_id):
         """
         Scrolls the page down to the middle for the given user_id.
@@ -185,6 +165,7 @@ class SeleniumController:
         browser.execute_script("window.scrollTo(0, document.body.scrollHeight / 3);")
         print(f"Scrolled to middle for user_id {user_id}")
 
+    @supervised
     def scroll_to_bottom(self, user_id):
         """
         Scrolls the page down to bottom for the given user_id.
@@ -196,6 +177,7 @@ class SeleniumController:
         browser.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         print(f"Scrolled down for user_id {user_id}")
 
+    @supervised
     def click_button_with_text(self, user_id, text):
         """
         Clicks the button specified by the Text for the given user_id.
@@ -213,6 +195,7 @@ class SeleniumController:
         print(f"Clicked button with Text {text}  for user_id {user_id}")
         return f"Clicked button with Text {text}  for user_id {user_id}"
 
+    @supervised
     def click_input_with_value(self, user_id, value):
         """
         Clicks the input specified by the Value for the given user_id.
@@ -230,6 +213,7 @@ class SeleniumController:
         print(f"Clicked input with Value {value}  for user_id {user_id}")
         return f"Clicked input with Value {value}  for user_id {user_id}"
 
+    @supervised
     def click_input_with_label(self, user_id, label_text):
         """
         Clicks the input specified by the text of the label for the given user_id.
@@ -254,6 +238,7 @@ class SeleniumController:
         print(f"Clicked input with Label {label_text}  for user_id {user_id}")
         return f"Clicked input with Label {label_text}  for user_id {user_id}"
 
+    @supervised
     def click_input_with_id(self, user_id, id):
         """
         Clicks the input specified by the ID for the given user_id.
@@ -271,6 +256,7 @@ class SeleniumController:
         print(f"Clicked input with ID {id}  for user_id {user_id}")
         return f"Clicked input with ID {id}  for user_id {user_id}"
 
+    @supervised
     def click_span_with_aria_label(self, user_id, aria_label, index=1):
         """
         Clicks the span specified by the Aria Label for the given user_id.
@@ -289,6 +275,7 @@ class SeleniumController:
         print(f"Clicked span with Aria Label {aria_label} of span element {index} for user_id {user_id}")
         return f"Clicked span with Aria Label {aria_label} of span element {index} for user_id {user_id}"
 
+    @supervised
     def click_element(self, user_id, xpath):
         """
         Clicks the element specified by the XPath for the given user_id.
@@ -305,6 +292,7 @@ class SeleniumController:
             return
         print(f"Clicked element with Xpath {xpath} for user_id {user_id}")
 
+    @supervised
     def navigate_with_url(self, user_id, url):
         """
         Navigates the browser to the specified URL for the given user_id.
@@ -317,6 +305,7 @@ class SeleniumController:
         print(f"Browser for user_id {user_id} navigated to {url}")
         return f"Browser for user_id {user_id} navigated to {url}"
 
+    @supervised
     def get_content(self, user_id):
         """
         Retrieves the content of the current page for the given user_id.
@@ -329,6 +318,7 @@ class SeleniumController:
         print(f"Content retrieved for user_id {user_id}")
         return content
     
+    @supervised
     def input_text_with_label(self, user_id, label_text, text, privacy = "None"):
         """
         Inputs text into the input element specified by the text of the label for the given user_id.
@@ -355,6 +345,7 @@ class SeleniumController:
             print(f"Text input '{privacy}' for input with Label {label_text} for user_id {user_id}")
             return f"Text input '{privacy}' for input with Label {label_text} for user_id {user_id}"
 
+    @supervised
     def input_text_with_name(self, user_id, name, text, privacy = "None"):
         """
         Inputs text into the input element specified by the Name for the given user_id.
@@ -377,6 +368,7 @@ class SeleniumController:
             print(f"Text input '{privacy}' for input with Name {name} for user_id {user_id}")
             return f"Text input '{privacy}' for input with Name {name} for user_id {user_id}"
 
+    @supervised
     def input_text(self, user_id, xpath, text):
         """
         Inputs text into the element specified by the XPath for the given user_id.
@@ -389,6 +381,7 @@ class SeleniumController:
         element.send_keys(text)
         print(f"Text input '{text}' for element with XPath {xpath} for user_id {user_id}")
 
+    @supervised
     def upload_file_with_id(self, user_id, id, file_path):
         """
         Uploads a file to the element specified by the ID for the given user_id.
@@ -406,6 +399,7 @@ class SeleniumController:
         print(f"File uploaded to element with ID {id} for user_id {user_id}")
         return f"File uploaded to element with ID {id} for user_id {user_id}"
 
+    @supervised
     def select_dropdown_option(self, user_id, option_text):
         """
         Selects the dropdown option specified by its text for the given user_id.
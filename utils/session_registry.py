@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict
+
+class SessionRegistry():
+    """
+    Thread-safe registry of the leased browser sessions: user_id -> pooled browser -> container id.
+    Sessions are kept in least-recently-used order, so idle and LRU sessions are found from the head
+    of the registry without scanning every session.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._last_used = {}
+        self._users_by_container = {}
+
+    def register(self, user_id, pooled):
+        with self._lock:
+            self._sessions[user_id] = pooled
+            self._sessions.move_to_end(user_id)
+            self._last_used[user_id] = time.monotonic()
+            self._users_by_container[pooled.container.id] = user_id
+
+    def unregister(self, user_id):
+        """
+        Removes the session of the user and returns its pooled browser, or None.
+        """
+        with self._lock:
+            pooled = self._sessions.pop(user_id, None)
+            self._last_used.pop(user_id, None)
+            if pooled is not None:
+                self._users_by_container.pop(pooled.container.id, None)
+            return pooled
+
+    def rebind_container(self, user_id, old_container_id, new_container_id):
+        """
+        Updates the container of the user's session after its container has been replaced.
+        """
+        with self._lock:
+            self._users_by_container.pop(old_container_id, None)
+            if user_id in self._sessions:
+                self._users_by_container[new_container_id] = user_id
+
+    def get(self, user_id):
+        with self._lock:
+            return self._sessions.get(user_id)
+
+    def get_user_by_container(self, container_id):
+        with self._lock:
+            return self._users_by_container.get(container_id)
+
+    def touch(self, user_id):
+        with self._lock:
+            if user_id in self._sessions:
+                self._sessions.move_to_end(user_id)
+                self._last_used[user_id] = time.monotonic()
+
+    def idle_sessions(self, idle_timeout):
+        """
+        Returns the (user_id, pooled) sessions unused for more than idle_timeout seconds.
+        """
+        now = time.monotonic()
+        idle = []
+        with self._lock:
+            for user_id, pooled in self._sessions.items():
+                if now - self._last_used[user_id] <= idle_timeout:
+                    break
+                idle.append((user_id, pooled))
+        return idle
+
+    def least_recently_used(self, min_idle):
+        """
+        Returns the least recently used (user_id, pooled) session if it has been unused for min_idle seconds.
+        """
+        with self._lock:
+            if not self._sessions:
+                return None
+            user_id, pooled = next(iter(self._sessions.items()))
+            if time.monotonic() - self._last_used[user_id] < min_idle:
+                return None
+            return user_id, pooled
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.items())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,26 @@
+import threading
+
+class SharedInstance():
+    """
+    Mixin of the process-wide shared objects. The instance is created on first use and reused afterwards.
+    """
+    # 所有類別共用的建立鎖；使用 RLock，建立時可以再取得其他共用物件
+    _instance_lock = threading.RLock()
+
+    @classmethod
+    def get_instance(cls, **kwargs):
+        return cls.get_or_create(lambda: kwargs)
+
+    @classmethod
+    def get_or_create(cls, get_kwargs):
+        """
+        Returns the shared instance, calling get_kwargs() for the constructor arguments only when it is created.
+        """
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            with cls._instance_lock:
+                instance = cls.__dict__.get("_instance")
+                if instance is None:
+                    instance = cls(**get_kwargs())
+                    cls._instance = instance
+        return instance
@@ -0,0 +1,211 @@
+import os
+import json
+import mmap
+import time
+import zlib
+import hashlib
+import threading
+
+from utils.shared_instance import SharedInstance
+
+class SnapshotStore(SharedInstance):
+    """
+    Full-text snapshots of crawled pages keyed by canonical url.
+    Texts are zlib-compressed records appended to a data file, which readers memory-map; the offset
+    index (url -> offset, length, fetch time, kind, content hash) is a JSON file replaced atomically.
+    Every compaction writes a new data file generation, so readers never see an index pointing into
+    a data file it was not written for.
+    The crawler writes the store in its own process; the Search tools reload the index when it changes.
+    """
+    def __init__(self, directory, max_age=7 * 86400, reload_check_interval=30, flush_every=50):
+        self.directory = directory
+        self.max_age = max_age
+        self.reload_check_interval = reload_check_interval
+        self.flush_every = flush_every
+        self.index_path = os.path.join(directory, "snapshot_index.json")
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._generation = 0
+        self._index_mtime = None
+        self._last_reload_check = 0.0
+        self._mmap = None
+        self._mmap_file = None
+        self._writer = None
+        self._unflushed = 0
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.load_index()
+
+    def get_data_path(self, generation=None):
+        return os.path.join(self.directory, f"snapshots-{self._generation if generation is None else generation}.dat")
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._index_mtime = os.path.getmtime(self.index_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {"generation": 0, "entries": {}}
+        self._index = data["entries"]
+        self._generation = data["generation"]
+        self.close_mmap()
+
+    def maybe_reload(self):
+        """
+        Reloads the index if the writer has replaced it since it was loaded.
+        """
+        now = time.monotonic()
+        # 有尚未寫入的修改時不重新載入，避免覆蓋記憶體中的索引
+        if self._writer is not None or self._unflushed > 0 or now - self._last_reload_check < self.reload_check_interval:
+            return
+        self._last_reload_check = now
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except FileNotFoundError:
+            return
+        if mtime != self._index_mtime:
+            self.load_index()
+
+    def close_mmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap_file.close()
+        self._mmap = None
+        self._mmap_file = None
+
+    def read_record(self, offset, length):
+        # 資料檔只會附加寫入，需要讀取超出目前映射範圍的紀錄時重新映射
+        if self._mmap is None or offset + length > len(self._mmap):
+            self.close_mmap()
+            self._mmap_file = open(self.get_data_path(), "rb")
+            self._mmap = mmap.mmap(self._mmap_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return zlib.decompress(self._mmap[offset:offset + length]).decode("utf-8")
+
+    def get(self, url):
+        """
+        Returns {"text", "kind", "fetched_at", "age"} of the url, or None if there is no snapshot
+        or it is older than max_age.
+        """
+        with self._lock:
+            self.maybe_reload()
+            entry = self._index.get(url)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            offset, length, fetched_at, kind, _ = entry
+            age = time.time() - fetched_at
+            if self.max_age is not None and age > self.max_age:
+                self.stale += 1
+                return None
+
+            try:
+                text = self.read_record(offset, length)
+            except (OSError, ValueError, zlib.error):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"text": text, "kind": kind, "fetched_at": fetched_at, "age": age}
+
+    def put(self, url, text, kind="html"):
+        """
+        Stores the text of the url. Unchanged texts only refresh the fetch time.
+        """
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None and entry[4] == content_hash:
+                entry[2] = time.time()
+            else:
+                if self._writer is None:
+                    self._writer = open(self.get_data_path(), "ab")
+                record = zlib.compress(text.encode("utf-8"))
+                offset = self._writer.tell()
+                self._writer.write(record)
+                self._index[url] = [offset, len(record), time.time(), kind, content_hash]
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self.flush_locked()
+
+    def touch(self, url):
+        """
+        Marks the snapshot of the url as still current (e.g. the page was not modified).
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None:
+                entry[2] = time.time()
+                self._unflushed += 1
+                if self._unflushed >= self.flush_every:
+                    self.flush_locked()
+
+    def write_index(self, generation, entries):
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"generation": generation, "entries": entries}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.index_path)
+
+    def flush_locked(self):
+        # 先確保資料寫入磁碟，再替換索引，讀取端看到的 offset 一定已經存在
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+        self.write_index(self._generation, self._index)
+        self._unflushed = 0
+
+    def flush(self):
+        with self._lock:
+            self.flush_locked()
+
+    def compact(self):
+        """
+        Rewrites the live records into a new data file generation, dropping replaced texts.
+        """
+        with self._lock:
+            self.flush_locked()
+            old_data_path = self.get_data_path()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+            new_generation = self._generation + 1
+            new_entries = {}
+            with open(self.get_data_path(new_generation), "wb") as f:
+                for url, (offset, length, fetched_at, kind, content_hash) in self._index.items():
+                    record = zlib.compress(self.read_record(offset, length).encode("utf-8"))
+                    new_entries[url] = [f.tell(), len(record), fetched_at, kind, content_hash]
+                    f.write(record)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.write_index(new_generation, new_entries)
+            self.close_mmap()
+            self._index = new_entries
+            self._generation = new_generation
+            if os.path.exists(old_data_path):
+                os.remove(old_data_path)
+
+    def dead_bytes_ratio(self):
+        try:
+            total_bytes = os.path.getsize(self.get_data_path())
+        except FileNotFoundError:
+            return 0.0
+        live_bytes = sum(entry[1] for entry in self._index.values())
+        return 1 - live_bytes / total_bytes if total_bytes else 0.0
+
+    def stats(self):
+        return {"pages": len(self._index), "hits": self.hits, "stale": self.stale, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            # 只有 touch 的重新爬取沒有開啟資料檔，仍需寫入更新後的時間
+            if self._writer is not None or self._unflushed > 0:
+                self.flush_locked()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self.close_mmap()
@@ -0,0 +1,78 @@
+import posixpath
+from urllib.parse import urljoin, urlsplit, urlunsplit, unquote_plus, quote
+
+# 追蹤用或每次請求都不同的查詢參數，不影響網頁內容
+DEFAULT_IGNORED_QUERY_PARAMS = {
+    "fbclid", "gclid", "yclid", "msclkid", "mc_cid", "mc_eid",
+    "phpsessid", "jsessionid", "aspsessionid", "sid", "_ga", "_gl", "_",
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+class UrlCanonicalizer():
+    """
+    Resolves hrefs against their page url with urljoin semantics and normalizes them,
+    so the same page spelled differently maps to a single canonical url.
+    Also keeps a seen-set of canonical urls for skipping repeated fetches.
+    """
+    def __init__(self, ignored_query_params=None, sort_query=True):
+        self.ignored_query_params = {p.lower() for p in (ignored_query_params or DEFAULT_IGNORED_QUERY_PARAMS)}
+        self.sort_query = sort_query
+        self.seen = set()
+
+    def canonicalize(self, href, base_url=None):
+        """
+        Returns the canonical absolute url of the href, or None for non-http links (javascript:, mailto:, #anchor ...).
+        """
+        if not href:
+            return None
+        href = href.strip()
+        if not href or href.startswith("#"):
+            return None
+
+        url = urljoin(base_url, href) if base_url else href
+        try:
+            parts = urlsplit(url)
+            port = parts.port # 非數字或超出範圍的 port 會拋出 ValueError
+        except ValueError:
+            return None
+
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            return None
+
+        host = parts.hostname.lower()
+        if port and port != DEFAULT_PORTS[scheme]:
+            host = f"{host}:{port}"
+
+        path = parts.path or "/"
+        # 處理 ./ 與 ../，保留結尾的斜線
+        normalized_path = posixpath.normpath(path)
+        if normalized_path.startswith("//"):
+            normalized_path = "/" + normalized_path.lstrip("/")
+        if path.endswith("/") and normalized_path != "/":
+            normalized_path += "/"
+        path = quote(normalized_path, safe="/%:@!$&'()*+,;=~")
+
+        # 查詢參數保留原始寫法 (?news 不會變成 ?news=)，只移除追蹤參數、空白段落並排序
+        query_params = [
+            param for param in parts.query.split("&")
+            if param and not self.is_ignored_query_param(param.split("=", 1)[0])
+        ]
+        if self.sort_query:
+            query_params.sort()
+        query = "&".join(query_params)
+
+        return urlunsplit((scheme, host, path, query, ""))
+
+    def is_ignored_query_param(self, key):
+        key = unquote_plus(key).lower()
+        return key in self.ignored_query_params or key.startswith("utm_")
+
+    def add(self, url):
+        """
+        Adds the url to the seen-set. Returns False if it has been seen before.
+        """
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        return True